@@ -0,0 +1,7 @@
+"""
+    Benchmark suite of the expense tracker API.
+
+        python -m benchmarks.run --output baseline.json        # load test (in-process or through uvicorn)
+        python -m benchmarks.micro --output micro.json         # microbenchmarks of the hot helpers
+        python -m benchmarks.compare baseline.json current.json
+"""
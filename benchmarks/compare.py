@@ -0,0 +1,61 @@
+"""
+    Compare two benchmark baselines (from benchmarks.run or benchmarks.micro).
+
+        python -m benchmarks.compare baseline.json current.json --threshold 0.10
+
+    Exits with status 1 when a scenario regressed by more than the threshold: p50/p95/p99
+    latency higher, or throughput lower, than the baseline by that fraction.
+"""
+import argparse
+import sys
+
+from benchmarks.results import load_report
+
+# Statistics compared, and whether a higher value is better
+COMPARED_STATISTICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "rps": True}
+
+
+def relative_change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Return the comparison table lines and the regressions found."""
+    lines = [f"{'scenario':<22}{'statistic':<10}{'baseline':>12}{'current':>12}{'change':>10}"]
+    regressions = []
+    for name, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(name)
+        if after is None:
+            lines.append(f"{name:<22}missing from the current run")
+            continue
+        for statistic, higher_is_better in COMPARED_STATISTICS.items():
+            if statistic not in before or statistic not in after:
+                continue
+            change = relative_change(before[statistic], after[statistic])
+            regressed = -change > threshold if higher_is_better else change > threshold
+            flag = "  REGRESSION" if regressed else ""
+            lines.append(f"{name:<22}{statistic:<10}{before[statistic]:>12}{after[statistic]:>12}{change:>+10.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name} {statistic}: {before[statistic]} -> {after[statistic]} ({change:+.1%})")
+        if after.get("errors", 0) > before.get("errors", 0):
+            regressions.append(f"{name} errors: {before.get('errors', 0)} -> {after['errors']}")
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark baselines.")
+    parser.add_argument("baseline", help="JSON baseline of the reference commit")
+    parser.add_argument("current", help="JSON baseline of the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Tolerated relative regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    baseline, current = load_report(args.baseline), load_report(args.current)
+    if baseline["parameters"] != current["parameters"]:
+        print(f"Warning: the runs used different parameters:\n  {baseline['parameters']}\n  {current['parameters']}",
+              file=sys.stderr)
+    print(f"baseline: {baseline['metadata']['commit']}  current: {current['metadata']['commit']}")
+    lines, regressions = compare_reports(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print(f"\nNo regression above {args.threshold:.0%}")
@@ -0,0 +1,101 @@
+"""
+    Microbenchmarks of the functions on the hot path of every request: token handling,
+    password verification, principal resolution and the report and alert queries.
+
+        python -m benchmarks.micro --output micro.json
+
+    Every case is timed call by call on a freshly seeded database, and reported with the
+    same statistics as the load test so both can be compared with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import inspect
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.results import build_report, summarize, write_report
+from benchmarks.seed import PASSWORD, USERNAME_FORMAT, seed_database
+
+
+async def measure(case: Callable[[], object], iterations: int, warmup: int) -> dict:
+    """Call the case `warmup` times, then time `iterations` calls one by one."""
+    async def call():
+        result = case()
+        if inspect.isawaitable(result):
+            await result
+
+    for _ in range(warmup):
+        await call()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+async def run_microbenchmarks(iterations: int, warmup: int) -> dict[str, dict]:
+    from src.alert_manager import iter_budget_alerts
+    from src.authentication_manager import get_current_user, user_cache
+    from src.database.database import AsyncSessionLocal
+    from src.password_manager import get_password_hash, verify_password
+    from src.report_manager import monthly_totals_by_category, totals_by_category, totals_by_user
+    from src.token_manager import create_access_token, verified_tokens, verify_token
+
+    username = USERNAME_FORMAT.format(0)
+    token = create_access_token({"sub": username})
+    hashed_password = get_password_hash(PASSWORD)
+    user_id = 2  # The first seeded user, after the admin
+    today = date.today()
+    year_ago = today - timedelta(days=365)
+
+    async def uncached_verify():
+        verified_tokens.clear()
+        verify_token(token)
+
+    async def uncached_current_user():
+        user_cache.clear()
+        await get_current_user(token, db)
+
+    async def alerts_page():
+        async for _ in iter_budget_alerts(today.year, today.month, limit=100):
+            pass
+
+    async with AsyncSessionLocal() as db:
+        # Argon2 is deliberately slow: a tenth of the iterations is plenty
+        cases = {
+            "jwt_encode": (lambda: create_access_token({"sub": username}), iterations),
+            "jwt_verify_cached": (lambda: verify_token(token), iterations),
+            "jwt_verify_uncached": (uncached_verify, iterations),
+            "password_verify": (lambda: verify_password(PASSWORD, hashed_password), max(iterations // 10, 1)),
+            "current_user_cached": (lambda: get_current_user(token, db), iterations),
+            "current_user_uncached": (uncached_current_user, iterations),
+            "report_monthly_totals": (lambda: monthly_totals_by_category(db, user_id, today.year, today.month), iterations),
+            "report_period_totals": (lambda: totals_by_category(db, user_id, year_ago, today), iterations),
+            "report_totals_by_user": (lambda: totals_by_user(db), iterations),
+            "alerts_page": (alerts_page, iterations),
+        }
+        results = {}
+        for name, (case, count) in cases.items():
+            results[name] = await measure(case, count, min(warmup, count))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark the hot helpers and write a JSON baseline.")
+    parser.add_argument("--users", type=int, default=100, help="Seeded users, besides the admin")
+    parser.add_argument("--expenses-per-user", type=int, default=200, help="Seeded expenses per user")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the data set")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per case")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls per case")
+    parser.add_argument("--output", default=None, help="JSON baseline file (stdout by default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(str(Path(directory) / "benchmark.db"), args.users, args.expenses_per_user, args.seed)
+        results = asyncio.run(run_microbenchmarks(args.iterations, args.warmup))
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    write_report(build_report("micro", parameters, results), args.output)
@@ -0,0 +1,72 @@
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Project root, where main.py lives
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    """Latency percentiles (in milliseconds) and throughput of one scenario."""
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    milliseconds = sorted(latency * 1000 for latency in latencies)
+    if len(milliseconds) > 1:
+        percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    else:
+        percentiles = milliseconds * 99
+    return {
+        "requests": len(milliseconds),
+        "errors": errors,
+        "rps": round(len(milliseconds) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "max_ms": round(milliseconds[-1], 3),
+    }
+
+def git_revision() -> dict:
+    """Commit the benchmark ran on, and whether the working tree had local changes."""
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def build_report(kind: str, parameters: dict, scenarios: dict[str, dict]) -> dict:
+    """Baseline document: run metadata, parameters and per-scenario statistics."""
+    return {
+        "kind": kind,
+        "metadata": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "parameters": parameters,
+        "scenarios": scenarios,
+    }
+
+def write_report(report: dict, output: str | None) -> None:
+    """Write the report as JSON (to stdout without an output file) and print a summary table."""
+    document = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(document + "\n")
+    else:
+        print(document)
+    print(f"\n{'scenario':<20}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+          file=sys.stderr)
+    for name, stats in report["scenarios"].items():
+        print(f"{name:<20}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10}"
+              f"{stats.get('p50_ms', '-'):>10}{stats.get('p95_ms', '-'):>10}{stats.get('p99_ms', '-'):>10}",
+              file=sys.stderr)
+
+def load_report(path: str) -> dict:
+    with open(path) as report_file:
+        return json.load(report_file)
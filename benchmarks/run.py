@@ -0,0 +1,244 @@
+"""
+    Load test of the API with concurrent clients.
+
+        python -m benchmarks.run --mode inprocess --output baseline.json
+        python -m benchmarks.run --mode uvicorn --workers 2 --concurrency 32 --output current.json
+
+    `inprocess` drives the FastAPI app through an ASGI transport (no network, measures the application)
+    inside its lifespan, so the migrations, the revocation sync, the job workers and the event broker
+    run as in a uvicorn worker. `uvicorn` starts a server subprocess on the seeded database and goes
+    through HTTP, warning about the per-worker settings when it starts several workers.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+from benchmarks.results import ROOT_DIR, build_report, summarize, write_report
+from benchmarks.seed import ADMIN_USERNAME, PASSWORD, USERNAME_FORMAT, seed_database, use_database
+
+################### SCENARIOS ###################
+
+@dataclass
+class Worker:
+    """One virtual client, logged in as one of the seeded users."""
+    index: int
+    user_id: int
+    username: str
+    headers: dict[str, str] = field(default_factory=dict)
+    admin_headers: dict[str, str] = field(default_factory=dict)
+    expense_ids: list[int] = field(default_factory=list)  # Created by expense_create, used by update and delete
+    sequence: int = 0
+
+Scenario = Callable[[httpx.AsyncClient, Worker], Awaitable[httpx.Response]]
+
+async def login(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.post("/token/", data={"username": worker.username, "password": PASSWORD,
+                                              "grant_type": "password"})
+
+async def users_me(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.get("/users/me", headers=worker.headers)
+
+async def expense_list(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.get("/expenses/", params={"limit": 50}, headers=worker.headers)
+
+async def expense_create(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    response = await client.post("/expenses/", headers=worker.headers, json={
+        "description": "Benchmark expense", "amount": 12.5, "category": "Food",
+    })
+    if response.status_code == 200:
+        worker.expense_ids.append(response.json()["expense"]["id"])
+    return response
+
+async def expense_update(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    worker.sequence += 1
+    expense_id = worker.expense_ids[worker.sequence % len(worker.expense_ids)]
+    return await client.put(f"/expenses/{expense_id}/", headers=worker.headers, json={
+        "description": "Updated benchmark expense", "amount": 13.75, "category": "Dining Out",
+    })
+
+async def expense_delete(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.delete(f"/expenses/{worker.expense_ids.pop()}/", headers=worker.headers)
+
+async def report_monthly(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    today = date.today()
+    return await client.get(f"/reports/monthly/{worker.user_id}/", headers=worker.headers,
+                            params={"month": today.month, "year": today.year})
+
+async def report_period(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    today = date.today()
+    return await client.get(f"/reports/period/{worker.user_id}/", headers=worker.headers,
+                            params={"start_date": (today - timedelta(days=365)).isoformat(),
+                                    "end_date": today.isoformat()})
+
+async def alerts(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.get("/alerts/", headers=worker.admin_headers, params={"limit": 100})
+
+# Scenarios in run order: the expense writes create, then update, then delete the same rows
+SCENARIOS: dict[str, Scenario] = {
+    "login": login,
+    "users_me": users_me,
+    "expense_list": expense_list,
+    "expense_create": expense_create,
+    "expense_update": expense_update,
+    "expense_delete": expense_delete,
+    "report_monthly": report_monthly,
+    "report_period": report_period,
+    "alerts": alerts,
+}
+
+################### FUNCTIONS ###################
+
+async def get_token(client: httpx.AsyncClient, username: str) -> dict[str, str]:
+    response = await client.post("/token/", data={"username": username, "password": PASSWORD,
+                                                  "grant_type": "password"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def create_workers(client: httpx.AsyncClient, concurrency: int, users: int) -> list[Worker]:
+    """Log every virtual client in, spreading them over the seeded users."""
+    admin_headers = await get_token(client, ADMIN_USERNAME)
+    workers = [
+        Worker(index=index, user_id=index % users + 2, username=USERNAME_FORMAT.format(index % users),
+               admin_headers=admin_headers)
+        for index in range(concurrency)
+    ]
+    tokens = {}
+    for worker in workers:
+        if worker.username not in tokens:
+            tokens[worker.username] = await get_token(client, worker.username)
+        worker.headers = tokens[worker.username]
+    return workers
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, workers: list[Worker],
+                       requests: int, warmup: int) -> dict:
+    """Run `warmup` unmeasured then `requests` measured calls of the scenario, spread over the workers."""
+    latencies: list[float] = []
+    errors = 0
+
+    async def drive(worker: Worker, count: int, measured: bool) -> None:
+        nonlocal errors
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await scenario(client, worker)
+            if measured:
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code >= 400
+
+    def shares(total: int) -> list[int]:
+        return [total // len(workers) + (index < total % len(workers)) for index in range(len(workers))]
+
+    await asyncio.gather(*(drive(worker, count, False) for worker, count in zip(workers, shares(warmup))))
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(worker, count, True) for worker, count in zip(workers, shares(requests))))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_until_healthy(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    selected = set(args.scenarios.split(",")) if args.scenarios else set(SCENARIOS)
+    unknown = selected - SCENARIOS.keys()
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if selected & {"expense_update", "expense_delete"} and "expense_create" not in selected:
+        raise SystemExit("expense_update and expense_delete work on the rows created by expense_create")
+    names = [name for name in SCENARIOS if name in selected]
+
+    server = None
+    # The ASGI transport does not run the lifespan: the in-process app enters it here, like a uvicorn worker
+    lifespan = AsyncExitStack()
+    if args.mode == "inprocess":
+        from main import app
+        await lifespan.enter_async_context(app.router.lifespan_context(app))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+    else:
+        if args.workers > 1:
+            from main import per_worker_state
+
+            for warning in per_worker_state():
+                print(f"Warning: {warning}", file=sys.stderr)
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=ROOT_DIR, env=os.environ.copy(),
+        )
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+
+    try:
+        async with client:
+            if server is not None:
+                await wait_until_healthy(client, server)
+            workers = await create_workers(client, args.concurrency, args.users)
+            results = {}
+            for name in names:
+                requests = args.login_requests if name == "login" else args.requests
+                results[name] = await run_scenario(client, SCENARIOS[name], workers, requests, args.warmup)
+                print(f"{name}: {results[name]['rps']} req/s, p95 {results[name].get('p95_ms')} ms", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        await lifespan.aclose()
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ("output", "database", "no_seed")}
+    return build_report("load", parameters, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the expense tracker API and write a JSON baseline.")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (uvicorn mode)")
+    parser.add_argument("--users", type=int, default=100, help="Seeded users, besides the admin")
+    parser.add_argument("--expenses-per-user", type=int, default=200, help="Seeded expenses per user")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the data set")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual clients")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50,
+                        help="Measured requests of the login scenario (bound by Argon2)")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per scenario")
+    parser.add_argument("--scenarios", default=None, help=f"Comma-separated subset of: {','.join(SCENARIOS)}")
+    parser.add_argument("--database", default=None, help="SQLite file to seed (a temporary file by default)")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the already seeded --database")
+    parser.add_argument("--output", default=None, help="JSON baseline file (stdout by default)")
+    args = parser.parse_args()
+
+    # Every virtual client logs in from the same address, which the login rate limiter would throttle
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = args.database or str(Path(directory) / "benchmark.db")
+        if args.no_seed:
+            use_database(database)
+        else:
+            seed_database(database, args.users, args.expenses_per_user, args.seed)
+        report = asyncio.run(run_benchmark(args))
+    write_report(report, args.output)
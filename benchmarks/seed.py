@@ -0,0 +1,93 @@
+"""
+    Seed a SQLite database with benchmark users and expenses.
+
+        python -m benchmarks.seed --database bench.db --users 100 --expenses-per-user 200
+
+    The src modules read DATABASE_URL when they are imported, so they are imported inside
+    the functions, after `use_database` pointed the configuration at the benchmark database.
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+# Credentials of the seeded accounts
+PASSWORD = "benchmark-password"
+ADMIN_USERNAME = "bench_admin"
+USERNAME_FORMAT = "bench_user_{}"
+
+# Expenses rows inserted per statement
+INSERT_BATCH_SIZE = 5000
+
+
+def use_database(path: str) -> str:
+    """Point the API configuration at a SQLite file, before any src module is imported."""
+    database_url = f"sqlite+aiosqlite:///{Path(path).resolve()}"
+    os.environ["DATABASE_URL"] = database_url
+    return database_url
+
+def seed_database(path: str, users: int, expenses_per_user: int, seed: int = 0) -> dict:
+    """
+    Create a fresh database at `path` with `users` users (plus one admin), each with
+    `expenses_per_user` expenses spread over the last year, and build the monthly rollup.
+
+    Returns the parameters of the seeded data set.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+    use_database(path)
+
+    from sqlalchemy import insert
+
+    from src.database.database import sync_engine
+    from src.database.migrations import run_migrations
+    from src.database.models import Expense, User, to_minor_units
+    from src.database.rollup import rebuild_monthly_spend
+    from src.password_manager import get_password_hash
+    from src.routes.expense import CATEGORIES
+
+    run_migrations()
+    rng = random.Random(seed)
+    hashed_password = get_password_hash(PASSWORD)  # Hashed once, Argon2 is deliberately slow
+    today = date.today()
+
+    with sync_engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": ADMIN_USERNAME, "hashed_password": hashed_password, "budget": 0.0,
+             "role": "admin", "disabled": False},
+            *({"username": USERNAME_FORMAT.format(index), "hashed_password": hashed_password,
+               "budget": float(rng.randrange(500, 5000)), "role": "user", "disabled": False}
+              for index in range(users)),
+        ])
+
+        batch = []
+        for user_id in range(2, users + 2):  # The admin got id 1
+            for _ in range(expenses_per_user):
+                batch.append({
+                    "user_id": user_id,
+                    "description": "Benchmark expense",
+                    "amount_cents": to_minor_units(round(rng.uniform(1, 250), 2)),
+                    "date": today - timedelta(days=rng.randrange(365)),
+                    "category": rng.choice(CATEGORIES),
+                })
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    connection.execute(insert(Expense), batch)
+                    batch.clear()
+        if batch:
+            connection.execute(insert(Expense), batch)
+        rebuild_monthly_spend(connection)
+
+    return {"users": users, "expenses_per_user": expenses_per_user, "seed": seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a SQLite database for the benchmarks.")
+    parser.add_argument("--database", default="bench.db", help="SQLite file to (re)create")
+    parser.add_argument("--users", type=int, default=100, help="Number of users, besides the admin")
+    parser.add_argument("--expenses-per-user", type=int, default=200, help="Expenses created for each user")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data sets")
+    args = parser.parse_args()
+
+    seed_database(args.database, args.users, args.expenses_per_user, args.seed)
+    print(f"Seeded {args.database}: {args.users} users, {args.users * args.expenses_per_user} expenses")
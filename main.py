@@ -14,72 +14,227 @@
 """
 # ==================================    Modules import     =========================================
 
-from fastapi import FastAPI
-from src.routes.user import router as user_router
-from src.routes.expense import router as expense_router
-from src.routes.report import router as report_router
-from src.routes.alert import router as alert_router
-from src.routes.health import router as health_router
-from src.routes.token import router as auth_router
-from src.database.database import Base, engine
+import time
 
+started = time.perf_counter()
 
-# Enriched tags metadata definition with names, descriptions, routers and prefixes
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI
+from src.config import (
+    DB_PROFILE,
+    EVENT_BROKER,
+    LOGIN_RATE_LIMIT_BACKEND,
+    LOGIN_RATE_LIMIT_ENABLED,
+    RUN_MIGRATIONS_ON_STARTUP,
+    SERVER_BACKLOG,
+    SERVER_FORWARDED_ALLOW_IPS,
+    SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    SERVER_HOST,
+    SERVER_KEEPALIVE_SECONDS,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER,
+    SERVER_PORT,
+    SERVER_WORKERS,
+)
+from src.database.database import engine, read_engine, replica_engines
+from src.metrics_manager import STARTUP_DURATION, MetricsMiddleware, instrument_engine
+
+logger = logging.getLogger("uvicorn.error")
+
+# Seconds spent in each startup step, reported once the worker is ready
+startup_timings = {"core imports": time.perf_counter() - started}
+
+
+# Enriched tags metadata definition with names, descriptions, router import paths and prefixes
 tags_metadata = [
     {
         "name": "Main",
         "description": "Health check and main operations.",
-        "router": health_router,
+        "router": "src.routes.health:router",
         "prefix": None
     },
     {
         "name": "Authentication",
         "description": "Endpoints for user authentication.",
-        "router": auth_router,
+        "router": "src.routes.token:router",
         "prefix": "/token"
     },
     {
         "name": "User Management",
         "description": "Operations related to user creation and management.",
-        "router": user_router,
+        "router": "src.routes.user:router",
         "prefix": "/users"
     },
     {
         "name": "Expenses",
         "description": "Operations to add, update, and delete expenses.",
-        "router": expense_router,
+        "router": "src.routes.expense:router",
         "prefix": "/expenses"
     },
     {
         "name": "Reports",
         "description": "Endpoints to generate monthly and custom period reports.",
-        "router": report_router,
+        "router": "src.routes.report:router",
         "prefix": "/reports"
     },
+    {
+        "name": "Exports",
+        "description": "Streamed CSV, NDJSON, Arrow and Parquet exports of report data.",
+        "router": "src.routes.export:router",
+        "prefix": "/reports/export"
+    },
     {
         "name": "Alerts",
         "description": "Endpoints to generate alerts for budget overruns.",
-        "router": alert_router,
+        "router": "src.routes.alert:router",
         "prefix": "/alerts"
     }
 ]
 
+################### FUNCTIONS ###################
+
+def load_router(path: str) -> APIRouter:
+    """Import a router from its "module:attribute" path, recording how long the module took to import."""
+    module_name, attribute = path.split(":")
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    startup_timings[f"import {module_name}"] = time.perf_counter() - started
+    return getattr(module, attribute)
+
+def report_startup() -> None:
+    """Log the startup timings, slowest step first, and expose them on /metrics."""
+    for step, seconds in startup_timings.items():
+        STARTUP_DURATION.set(seconds, step=step)
+    lines = [f"  {seconds * 1000:8.1f} ms  {step}"
+             for step, seconds in sorted(startup_timings.items(), key=lambda item: item[1], reverse=True)]
+    total = time.perf_counter() - started
+    logger.info("Worker ready in %.1f ms:\n%s", total * 1000, "\n".join(lines))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Bring the database schema up to date and load the revoked sessions before serving,
+    keep them in sync, run the report job workers and relay the events while serving, then dispose
+    the connection pools on shutdown.
+
+    Alembic is only imported here, so a worker started with RUN_MIGRATIONS_ON_STARTUP=false
+    (migrations applied once per deploy) does not pay for it.
+    """
+    if RUN_MIGRATIONS_ON_STARTUP:
+        step_started = time.perf_counter()
+        from src.database.migrations import run_migrations
+
+        await asyncio.to_thread(run_migrations)
+        startup_timings["migrations"] = time.perf_counter() - step_started
+    from src.event_manager import event_bus
+    from src.job_manager import job_manager
+    from src.revocation_manager import revocation_list
+
+    await revocation_list.sync(full=True)
+    revocation_sync = asyncio.create_task(revocation_list.run())
+    job_manager.start()
+    await event_bus.start()
+    report_startup()
+    yield
+    await event_bus.stop()
+    revocation_sync.cancel()
+    await job_manager.stop()
+    for pooled_engine in {engine, read_engine, *replica_engines}:
+        await pooled_engine.dispose()
+
+def per_worker_state() -> list[str]:
+    """Configured features whose state stays inside each worker, and so behave differently with several workers."""
+    warnings = []
+    if LOGIN_RATE_LIMIT_ENABLED and LOGIN_RATE_LIMIT_BACKEND == "local":
+        warnings.append("LOGIN_RATE_LIMIT_BACKEND=local: every worker has its own login buckets, "
+                        "so the login limits are multiplied by the number of workers")
+    if EVENT_BROKER == "local":
+        warnings.append("EVENT_BROKER=local: the alert streams only receive the writes handled by their own worker")
+    return warnings
+
+def run_server(args: argparse.Namespace) -> None:
+    """
+    Serve the app with `args.workers` uvicorn processes sharing one listening socket.
+
+    The app is already imported by this process when the workers start, so a broken import stops the
+    launch at once, and the migrations run here once instead of in every worker. The supervisor
+    replaces the workers that exit, recycled after `max_requests` requests or crashed, and on
+    SIGTERM/SIGINT every worker stops accepting connections and drains its in-flight requests for up
+    to `graceful_timeout` seconds.
+    """
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    if RUN_MIGRATIONS_ON_STARTUP:
+        from src.database.migrations import run_migrations
+
+        run_migrations()
+        os.environ["RUN_MIGRATIONS_ON_STARTUP"] = "false"  # Inherited by the workers
+
+    # uvloop and httptools (uvicorn[standard]) when installed, the pure Python implementations otherwise
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    config = uvicorn.Config(
+        # Workers are spawned processes that run this file again as __main__: the app they serve is
+        # the one built there, not a second copy imported as "main"
+        "__main__:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        log_level=args.log_level,
+        access_log=args.access_log,
+    )
+    logger.info("Starting %d workers on %s:%d (%s, %s)", args.workers, args.host, args.port, loop, http)
+    if args.workers > 1:
+        for warning in per_worker_state():
+            logger.warning("%s. Use the redis backend, or a single worker.", warning)
+    # Supervised even with a single worker, so it is replaced once recycled
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+
+################### APP ###################
+
 # FastAPI app
 app = FastAPI(
     title="Personal Expense Tracking API",
     description="An API to manage personal expenses, set budgets, generate alerts, and create detailed reports.",
     version="1.0.0",
-    openapi_tags=[{"name": tag["name"], "description": tag["description"]} for tag in tags_metadata]
+    openapi_tags=[{"name": tag["name"], "description": tag["description"]} for tag in tags_metadata],
+    lifespan=lifespan,
 )
 
-# Initialize the database
-Base.metadata.create_all(bind=engine)
+# Slow query log and repeated statement detection, within the requests timed by MetricsMiddleware
+if DB_PROFILE:
+    from src.database.profiler import QueryProfilerMiddleware, profile_engine
+
+    for profiled_engine in {engine, read_engine, *replica_engines}:
+        profile_engine(profiled_engine.sync_engine)
+    app.add_middleware(QueryProfilerMiddleware)
+
+# Request latency and database timing metrics, exposed on /metrics
+for instrumented_engine in {engine, read_engine, *replica_engines}:
+    instrument_engine(instrumented_engine.sync_engine)
+app.add_middleware(MetricsMiddleware)
 
 # Dynamically include routers
 for tag in tags_metadata:
     prefix = tag["prefix"] or ""  # Replace None with an empty string
-    app.include_router(tag["router"], prefix=prefix, tags=[tag["name"]])
-
+    router = load_router(tag["router"])
+    app.include_router(router, prefix=prefix, tags=[tag["name"]])
 
 # ===========================================================================================================================
 # =                                                Standalone way                                                        =
@@ -87,5 +242,21 @@ for tag in tags_metadata:
 
 if __name__ == '__main__':
 
-    print("Try to do something smart...")
-    print("... but I don't know what yet.")
+    parser = argparse.ArgumentParser(description="Serve the API with several uvicorn workers.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes")
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG, help="Pending connections queued by the kernel")
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEPALIVE_SECONDS,
+                        help="Seconds an idle keep-alive connection stays open")
+    parser.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT_SECONDS,
+                        help="Seconds in-flight requests are drained for on shutdown")
+    parser.add_argument("--max-requests", type=int, default=SERVER_MAX_REQUESTS,
+                        help="Requests after which a worker is replaced (0: never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=SERVER_MAX_REQUESTS_JITTER,
+                        help="Random extra requests per worker before it is replaced")
+    parser.add_argument("--forwarded-allow-ips", default=SERVER_FORWARDED_ALLOW_IPS,
+                        help="Proxies trusted for the X-Forwarded-* headers")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    run_server(parser.parse_args())
@@ -0,0 +1,38 @@
+"""Composite expense indexes and amounts in minor units
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00
+
+The new integer column is added and backfilled in place with a single UPDATE,
+then the float column is dropped. On PostgreSQL the table is never copied; SQLite
+may rebuild it to drop the column.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_expenses_user_id_date", "expenses", ["user_id", "date"])
+    op.create_index("ix_expenses_user_id_category_date", "expenses", ["user_id", "category", "date"])
+
+    op.add_column("expenses", sa.Column("amount_cents", sa.Integer(), nullable=True))
+    op.execute("UPDATE expenses SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)")
+    op.drop_column("expenses", "amount")
+
+
+def downgrade() -> None:
+    op.add_column("expenses", sa.Column("amount", sa.Float(), nullable=True))
+    op.execute("UPDATE expenses SET amount = amount_cents / 100.0")
+    op.drop_column("expenses", "amount_cents")
+
+    op.drop_index("ix_expenses_user_id_category_date", table_name="expenses")
+    op.drop_index("ix_expenses_user_id_date", table_name="expenses")
@@ -0,0 +1,61 @@
+"""Monthly spend rollup table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    monthly_spend = op.create_table(
+        "monthly_spend",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("total_cents", sa.Integer(), nullable=False),
+        sa.Column("expense_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "year", "month", "category"),
+    )
+
+    # Backfill from the existing expenses
+    expenses = sa.table(
+        "expenses",
+        sa.column("id", sa.Integer()),
+        sa.column("user_id", sa.Integer()),
+        sa.column("date", sa.Date()),
+        sa.column("category", sa.String()),
+        sa.column("amount_cents", sa.Integer()),
+    )
+    year = sa.extract("year", expenses.c.date)
+    month = sa.extract("month", expenses.c.date)
+    op.execute(
+        monthly_spend.insert().from_select(
+            ["user_id", "year", "month", "category", "total_cents", "expense_count"],
+            sa.select(
+                expenses.c.user_id,
+                year,
+                month,
+                expenses.c.category,
+                sa.func.coalesce(sa.func.sum(expenses.c.amount_cents), 0),
+                sa.func.count(expenses.c.id),
+            )
+            .where(expenses.c.user_id.is_not(None), expenses.c.date.is_not(None), expenses.c.category.is_not(None))
+            .group_by(expenses.c.user_id, year, month, expenses.c.category),
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("monthly_spend")
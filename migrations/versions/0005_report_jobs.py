@@ -0,0 +1,42 @@
+"""Background report jobs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("cache_key", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("requested_by", sa.Integer(), nullable=True),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.Integer(), nullable=True),
+        sa.Column("finished_at", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_report_jobs_cache_key", "report_jobs", ["cache_key"])
+    op.create_index("ix_report_jobs_status_created_at", "report_jobs", ["status", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_report_jobs_status_created_at", table_name="report_jobs")
+    op.drop_index("ix_report_jobs_cache_key", table_name="report_jobs")
+    op.drop_table("report_jobs")
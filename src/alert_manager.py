@@ -0,0 +1,85 @@
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+
+from src.config import ALERT_BATCH_SIZE, ALERT_THRESHOLDS
+from src.database.database import read_session
+from src.database.models import MonthlySpend, User, from_minor_units
+
+
+def crossed_threshold(spent: float, budget: float, thresholds: list[float] = ALERT_THRESHOLDS) -> float | None:
+    """Return the highest budget fraction the spending went over, or None if it stays under all of them."""
+    crossed = [threshold for threshold in thresholds if spent > threshold * budget]
+    return crossed[-1] if crossed else None
+
+def alert_message(threshold: float) -> str:
+    if threshold >= 1:
+        return "Budget exceeded!"
+    return f"{threshold:.0%} of budget reached"
+
+def alert_for_spend(event: dict) -> dict | None:
+    """
+    Alert of a spend event (see src/event_manager.py), if the write moved its user over a higher
+    threshold than before; None if it crossed none, or only thresholds already crossed.
+    """
+    if event["budget"] is None:
+        return None
+    threshold = crossed_threshold(event["spent"], event["budget"])
+    if threshold is None:
+        return None
+    if event["budget_before"] is not None:
+        previous = crossed_threshold(event["spent_before"], event["budget_before"])
+        if previous is not None and previous >= threshold:
+            return None
+    return {
+        "user_id": event["user_id"],
+        "username": event["username"],
+        "year": event["year"],
+        "month": event["month"],
+        "budget": event["budget"],
+        "total_expenses": event["spent"],
+        "threshold": threshold,
+        "alert": alert_message(threshold),
+    }
+
+async def iter_budget_alerts(year: int, month: int, after: int = 0, limit: int | None = None,
+                             batch_size: int = ALERT_BATCH_SIZE) -> AsyncIterator[dict]:
+    """
+    Yield the users whose spending for the month crossed one of the alert thresholds, by increasing user id.
+
+    Each batch is a single grouped query over the monthly rollup, keeping the users whose spending
+    exceeds the lowest threshold of their monthly budget (which expense writes leave untouched),
+    paginated by keyset on the user id, so memory stays bounded whatever the number of users.
+    """
+    spent_cents = func.sum(MonthlySpend.total_cents)
+    remaining = limit
+    async with read_session() as db:
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            query = (
+                select(User.id, User.username, User.budget, spent_cents.label("spent_cents"))
+                .join(MonthlySpend, MonthlySpend.user_id == User.id)
+                .where(MonthlySpend.year == year, MonthlySpend.month == month, User.id > after,
+                       User.budget.is_not(None))
+                .group_by(User.id, User.username, User.budget)
+                .having(spent_cents > ALERT_THRESHOLDS[0] * User.budget * 100)
+                .order_by(User.id)
+                .limit(size)
+            )
+            rows = (await db.execute(query)).all()
+            for row in rows:
+                spent = from_minor_units(row.spent_cents)
+                threshold = crossed_threshold(spent, row.budget) or ALERT_THRESHOLDS[0]
+                yield {
+                    "user_id": row.id,
+                    "username": row.username,
+                    "budget": row.budget,
+                    "total_expenses": spent,
+                    "threshold": threshold,
+                    "alert": alert_message(threshold),
+                }
+            if len(rows) < size:
+                break
+            after = rows[-1].id
+            if remaining is not None:
+                remaining -= len(rows)
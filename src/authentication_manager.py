@@ -0,0 +1,102 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache_manager import TTLCache
+from src.config import USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS
+from src.database.database import get_read_db
+from src.database.models import User as UserModel
+from src.revocation_manager import revocation_list
+from src.token_manager import verify_token
+
+# OAuth2 scheme
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+################### MODELS ###################
+
+class CurrentUser(BaseModel):
+    """Principal of the authenticated user, detached from any database session."""
+    id: int
+    username: str
+    role: str | None = None
+    disabled: bool | None = False
+    budget: float | None = None
+    version: int = 1
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+# Resolved principals keyed by the token subject (username)
+user_cache = TTLCache(max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+################### FUNCTIONS ###################
+
+def invalidate_user(*usernames: str) -> None:
+    """Drop cached principals, to be called whenever a user's row changes or is deleted."""
+    for username in usernames:
+        user_cache.pop(username)
+
+def decode_jwt_token(token: str) -> dict:
+    """Decode and return the payload of a JWT token."""
+    try:
+        return verify_token(token)
+    except JWTError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from e
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)],
+                           db: Annotated[AsyncSession, Depends(get_read_db)]
+                           ) -> CurrentUser:
+    try:
+        payload = decode_jwt_token(token)
+        username: str = payload.get("sub")
+        session_id = payload.get("sid")
+        revoked = session_id is not None and session_id in revocation_list
+        if username is None or payload.get("type") == "refresh" or revoked:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = user_cache.get(username)
+        if user is None:
+            result = await db.execute(select(UserModel).where(UserModel.username == username))
+            db_user = result.scalars().first()
+            if db_user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid authentication credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user = CurrentUser.model_validate(db_user)
+            user_cache.set(username, user)
+        if user.disabled:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User account is disabled",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return user
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error",
+        ) from e
+
+def is_admin(current_user: Annotated[CurrentUser, Depends(get_current_user)]):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action."
+        )
+    return current_user
@@ -0,0 +1,220 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Hashable
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_MAX_SIZE,
+    RESPONSE_CACHE_REDIS_URL,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from src.database.models import DataVersion
+from src.database.upsert import upsert
+from src.response_manager import encode_json
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire after a time-to-live.
+
+    The cache is meant to be used from the event loop thread only, it does no locking.
+    Hits, misses and evictions are counted so that the cache efficiency can be monitored.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for a key, or `default` if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store a value, expiring after `ttl` seconds (the cache default if not given)."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a key from the cache if present."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return the cache counters."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class LocalCacheBackend:
+    """Response cache storage inside the worker process (entries are not shared between workers)."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.entries = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        self.entries.set(key, value, ttl=ttl)
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of the async Redis client used by the cache, for development and tests."""
+
+    def __init__(self):
+        self.entries = TTLCache(max_size=RESPONSE_CACHE_MAX_SIZE, ttl=float("inf"))
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes | str, ex: int | None = None) -> bool:
+        self.entries.set(key, value.encode() if isinstance(value, str) else value, ttl=ex)
+        return True
+
+
+class RedisCacheBackend:
+    """Response cache storage in Redis (or any client with the same async get/set API), shared by all workers."""
+
+    def __init__(self, client, prefix: str = "expense-tracker:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        await self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+
+def create_cache_backend(name: str = RESPONSE_CACHE_BACKEND):
+    """Build the response cache backend selected in the configuration."""
+    if name == "local":
+        return LocalCacheBackend(max_size=RESPONSE_CACHE_MAX_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+    if name == "fake-redis":
+        return RedisCacheBackend(FakeRedis())
+    if name == "redis":
+        from redis.asyncio import from_url  # Optional dependency, only needed with this backend
+
+        return RedisCacheBackend(from_url(RESPONSE_CACHE_REDIS_URL))
+    raise ValueError(f"Unknown response cache backend: {name}")
+
+
+class ResponseCache:
+    """
+    Caches JSON responses per data scope and answers conditional requests.
+
+    Every scope ("user:<id>", or "all" for cross-user data) has a data version, a row of the
+    `data_versions` table replaced by `invalidate_user` in the transaction of every write of that
+    user's data, so all the workers see it as soon as the write is committed. The ETag of a response
+    is derived from the version, the path and the query parameters, so a client polling unchanged
+    data gets a 304 for a single primary key lookup, and a cached body is never served after a write.
+    """
+
+    # Version of a scope never written to since the table was created
+    INITIAL_VERSION = {"token": "initial", "modified": 0}
+
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def version(self, db: AsyncSession, scope: str) -> dict:
+        """Current data version of a scope."""
+        row = (await db.execute(
+            select(DataVersion.token, DataVersion.modified).where(DataVersion.scope == scope))).first()
+        return {"token": row.token, "modified": row.modified} if row is not None else self.INITIAL_VERSION
+
+    async def invalidate_user(self, db: AsyncSession, user_id: int) -> None:
+        """
+        Start a new data version for a user, and for the cross-user data they are part of,
+        inside the caller's transaction.
+        """
+        token, modified = uuid.uuid4().hex, int(time.time())
+        rows = [{"scope": scope, "token": token, "modified": modified} for scope in (f"user:{user_id}", "all")]
+        await upsert(db, DataVersion, rows, ["scope"],
+                     lambda excluded: {"token": excluded.token, "modified": excluded.modified})
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, modified: int | None) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+            return "*" in candidates or etag in candidates
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None and modified is not None:
+            try:
+                return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def respond(self, request: Request, db: AsyncSession, scope: str,
+                      compute: Callable[[], Awaitable[Any]]) -> Response:
+        """Answer with a 304, the cached body, or the freshly computed (then cached) content."""
+        version = await self.version(db, scope)
+        query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+        digest = hashlib.sha256(f"{scope}|{version['token']}|{request.url.path}?{query}".encode()).hexdigest()
+        etag = f'"{digest[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if version["modified"]:
+            headers["Last-Modified"] = formatdate(version["modified"], usegmt=True)
+        if self._not_modified(request, etag, version["modified"]):
+            return Response(status_code=304, headers=headers)
+
+        body = await self.backend.get(f"response:{digest}")
+        if body is None:
+            body = encode_json(await compute())
+            await self.backend.set(f"response:{digest}", body, ttl=self.ttl)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def respond_row(self, request: Request, etag: str, content: Any) -> Response:
+        """
+        Answer with a 304 or the content of a single row resource, whose ETag is its row version
+        (which its writes then accept back in If-Match). The body is not cached: it is the row itself.
+        """
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if self._not_modified(request, etag, None):
+            return Response(status_code=304, headers=headers)
+        return Response(content=encode_json(content), media_type="application/json", headers=headers)
+
+
+# Shared response cache used by the routers
+response_cache = ResponseCache(create_cache_backend())
@@ -6,5 +6,104 @@ load_dotenv()
 
 # Centralized configuration variables
 SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key")  # Default
-ALGORITHM = os.getenv("ALGORITHM")
-JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", 30))  # Default to 30 minutes
\ No newline at end of file
+ALGORITHM = os.getenv("ALGORITHM", "HS256")  # HS256/384/512, or RS*/ES* with a private key file
+JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", 30))  # Default to 30 minutes
+JWT_KEY_ID = os.getenv("JWT_KEY_ID", "default")  # "kid" header of the tokens signed by this instance
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE")  # PEM signing key for RS*/ES* algorithms
+JWT_ROTATED_KEYS = os.getenv("JWT_ROTATED_KEYS", "")  # "kid=value,..." previous keys still accepted (PEM public key file, or secret for HS*)
+JWT_TOKEN_CACHE_SIZE = int(os.getenv("JWT_TOKEN_CACHE_SIZE", 10000))  # Verified tokens kept until they expire
+JWT_REFRESH_EXPIRATION_DAYS = int(os.getenv("JWT_REFRESH_EXPIRATION_DAYS", 7))  # Lifetime of a login session
+
+# Revoked sessions, held in memory by every worker and synced from the refresh_tokens table
+TOKEN_REVOCATION_SYNC_SECONDS = int(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 10))  # Max delay before other workers reject a revoked token
+TOKEN_REVOCATION_REBUILD_SECONDS = int(os.getenv("TOKEN_REVOCATION_REBUILD_SECONDS", 3600))  # Full reload, dropping expired entries
+TOKEN_REVOCATION_BLOOM_CAPACITY = int(os.getenv("TOKEN_REVOCATION_BLOOM_CAPACITY", 100000))  # Revocations the Bloom filter is sized for
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("TOKEN_REVOCATION_BLOOM_ERROR_RATE", 0.001))  # False positives, confirmed by the exact set
+
+# Database configuration (the driver selects the async backend: sqlite+aiosqlite or postgresql+asyncpg)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./expense_tracker.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Connections kept open in the pool
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))  # Extra connections allowed under load
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Recycle connections after 30 minutes
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # Check connections before use
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"  # Log every SQL statement
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"  # Disable when migrations run once per deploy
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", DB_POOL_SIZE))  # Read-only connections used by the GET routes
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]  # Read replicas, same driver as DATABASE_URL
+DB_REPLICA_RETRY_SECONDS = int(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))  # A replica that failed to connect is skipped this long
+DB_READ_YOUR_WRITES_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))  # Reads of a client stay on the primary after its writes
+
+# SQLite profile, applied to every new connection (ignored by other databases)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # WAL: readers don't block the writer and vice versa
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL: with WAL, fsync at checkpoints instead of every commit
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))  # Bytes of the file read through mmap
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64000))  # Page cache per connection (negative: in KiB)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))  # Wait for a lock held by another worker before failing
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")  # Temporary tables and sort spills kept in memory
+
+# Query profiler (opt-in, for development and load tests: slow query log and repeated statement detection)
+DB_PROFILE = os.getenv("DB_PROFILE", "false").lower() == "true"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 100))  # Statements slower than this are logged
+DB_SLOW_QUERY_EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "true").lower() == "true"  # Log the query plan of the slow statements
+DB_REPEATED_STATEMENT_THRESHOLD = int(os.getenv("DB_REPEATED_STATEMENT_THRESHOLD", 5))  # Identical statements in one request flagged as a likely N+1
+
+# Password hashing pool (Argon2 runs off the event loop, in threads or processes)
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_HASH_MAX_WORKERS = int(os.getenv("PASSWORD_HASH_MAX_WORKERS", os.cpu_count() or 1))  # Concurrent hashes
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))  # Waiting hashes before answering 503
+
+# Login rate limiting (token buckets checked before any database lookup or password verification)
+LOGIN_RATE_LIMIT_ENABLED = os.getenv("LOGIN_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "local")  # "local" (per worker) or "redis" (shared)
+LOGIN_RATE_LIMIT_REDIS_URL = os.getenv("LOGIN_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+LOGIN_RATE_LIMIT_MAX_KEYS = int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", 100000))  # Buckets kept by the local backend
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))  # Attempts a client IP may make at once
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 30))  # Attempts per minute and client IP after the burst
+LOGIN_USERNAME_BURST = int(os.getenv("LOGIN_USERNAME_BURST", 5))  # Attempts on one username at once
+LOGIN_USERNAME_PER_MINUTE = float(os.getenv("LOGIN_USERNAME_PER_MINUTE", 5))  # Attempts per minute and username after the burst
+
+# Authenticated user cache (principal resolved from the token "sub", invalidated on user writes)
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))  # Max staleness across workers
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))  # Least recently used users are evicted first
+
+# Budget alerts
+ALERT_THRESHOLDS = sorted(float(value) for value in os.getenv("ALERT_THRESHOLDS", "0.8,1.0").split(","))  # Fractions of the budget
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", 500))  # Users fetched per keyset page while streaming
+
+# Bulk expense ingestion
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", 1000))  # Rows validated and inserted per transaction
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", 1000))  # Row errors listed in the response
+
+# Background report jobs (SQLite-backed job table, claimed by asyncio workers in any process)
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))  # Workers per API process (0: run `python -m src.job_manager` instead)
+REPORT_JOB_POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", 2))  # Idle workers look for jobs submitted to other processes this often
+REPORT_JOB_CHUNK_SIZE = int(os.getenv("REPORT_JOB_CHUNK_SIZE", 1000))  # Users aggregated per query
+REPORT_JOB_RESULT_TTL_SECONDS = int(os.getenv("REPORT_JOB_RESULT_TTL_SECONDS", 300))  # A finished job answers identical requests this long
+REPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("REPORT_JOB_TIMEOUT_SECONDS", 600))  # A running job older than this is considered lost and run again
+
+# Event pipeline (spend events of the writes, pushed to the alert streams)
+EVENT_BROKER = os.getenv("EVENT_BROKER", "local")  # "local" (subscribers of the same worker) or "redis" (all workers)
+EVENT_BROKER_REDIS_URL = os.getenv("EVENT_BROKER_REDIS_URL", "redis://localhost:6379/0")
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))  # Events buffered per subscriber, the oldest are dropped beyond
+ALERT_STREAM_KEEPALIVE_SECONDS = int(os.getenv("ALERT_STREAM_KEEPALIVE_SECONDS", 15))  # Comment line sent on idle streams, keeps proxies from closing them
+
+# Report exports
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 5000))  # Rows fetched from the cursor and serialized at a time
+
+# HTTP response cache (ETag / Last-Modified) for reports and the user profile
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "local")  # "local", "redis" or "fake-redis"
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))  # Lifetime of a cached body
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", 10000))  # Bodies kept by the local backend
+
+# Server launched by `python main.py` (uvicorn workers behind a supervisor process)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))  # Worker processes, one per core by default
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))  # Pending connections queued by the kernel (capped by net.core.somaxconn)
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", 75))  # Idle keep-alive connections, longer than the proxy's so it closes them first
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))  # In-flight requests drained on SIGTERM before they are cut
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 10000))  # A worker is replaced after this many requests (0: never)
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 1000))  # Random extra requests, so the workers are not all replaced at once
+SERVER_FORWARDED_ALLOW_IPS = os.getenv("SERVER_FORWARDED_ALLOW_IPS", "127.0.0.1")  # Proxies trusted for X-Forwarded-For / X-Forwarded-Proto
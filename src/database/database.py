@@ -1,23 +1,170 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.config import (
+    DATABASE_REPLICA_URLS,
+    DATABASE_URL,
+    DB_ECHO,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_READ_POOL_SIZE,
+    DB_READ_YOUR_WRITES_SECONDS,
+    DB_REPLICA_RETRY_SECONDS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_TEMP_STORE,
+)
+from src.database.routing import ReplicaRouter
+
+# Synchronous URL derived from the async one (e.g. "sqlite+aiosqlite" -> "sqlite"),
+# used by scripts and schema management that don't run inside the event loop
+_url = make_url(DATABASE_URL)
+SYNC_DATABASE_URL = _url.set(drivername=_url.get_backend_name())
+
+# Pragmas run on every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "temp_store": SQLITE_TEMP_STORE,
+}
+
+
+def _is_memory_database(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _engine_options(url, pool_size: int = DB_POOL_SIZE) -> dict:
+    """Build the engine keyword arguments (pool sizing and driver options) for a database URL."""
+    url = make_url(url)
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_database(url):
+            # An in-memory database only lives as long as its single connection
+            return options
+    options.update(
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+def configure_sqlite(engine, read_only: bool = False) -> None:
+    """Apply the SQLite profile to every connection the engine opens (the `sync_engine` of an async engine)."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        if read_only:
+            # Any write through this connection fails instead of taking the database lock
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+# Create the async database engine used by the API
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+configure_sqlite(engine.sync_engine)
+
+# Read-only pool used by the GET routes, so reads never queue behind the connections held by writes.
+# An in-memory database only exists on its own connection, so it is read through the main engine.
+if _is_memory_database(DATABASE_URL):
+    read_engine = engine
+else:
+    read_engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL, DB_READ_POOL_SIZE))
+    configure_sqlite(read_engine.sync_engine, read_only=True)
 
-# Database configuration
-DATABASE_URL = "sqlite:///./expense_tracker.db"
+# Read replicas, used round-robin by the read-only sessions
+replica_engines = [create_async_engine(url, **_engine_options(url, DB_READ_POOL_SIZE)) for url in DATABASE_REPLICA_URLS]
+for replica_engine in replica_engines:
+    configure_sqlite(replica_engine.sync_engine, read_only=True)
+read_router = ReplicaRouter(read_engine, replica_engines, DB_REPLICA_RETRY_SECONDS)
 
-# Create the database engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Cookie holding the time of the client's last write (milliseconds since the epoch)
+LAST_WRITE_COOKIE = "last_write"
 
-# Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class PrimarySession(Session):
+    """Session of the primary database, which remembers the response of the request it writes for (see `get_db`)."""
+
+@event.listens_for(PrimarySession, "after_commit")
+def stick_client_to_primary(session):
+    # Kept by the client rather than the worker, so its next read sees the write whichever worker serves it
+    response = session.info.get("response")
+    if response is not None and read_router.replicas:
+        response.set_cookie(LAST_WRITE_COOKIE, str(int(time.time() * 1000)), max_age=DB_READ_YOUR_WRITES_SECONDS,
+                            httponly=True, samesite="lax")
+
+
+# Create configured "AsyncSession" classes
+AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=PrimarySession,
+                                       autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Synchronous engine and "Session" class for scripts and schema creation
+sync_engine = create_engine(SYNC_DATABASE_URL, **_engine_options(SYNC_DATABASE_URL))
+configure_sqlite(sync_engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 
 # Base class for models
 Base = declarative_base()
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
+def wrote_recently(request: Request) -> bool:
+    """Whether the client committed a write within the read-your-writes window (its last write cookie)."""
     try:
+        written_at = int(request.cookies.get(LAST_WRITE_COOKIE, "")) / 1000
+    except ValueError:
+        return False
+    return time.time() - written_at < DB_READ_YOUR_WRITES_SECONDS
+
+@asynccontextmanager
+async def read_session(primary: bool = False) -> AsyncIterator[AsyncSession]:
+    """
+    Read-only session on a healthy replica, taken round-robin, or on the primary when no replica
+    can be reached or `primary` is set (the client wrote recently).
+    """
+    for candidate in read_router.candidates(primary):
+        db = AsyncReadSessionLocal(bind=candidate)
+        if candidate is read_router.primary:
+            break
+        try:
+            await db.connection()  # Connect now, so an unreachable replica falls back to the next engine
+            break
+        except (DBAPIError, OSError):
+            await db.close()
+            read_router.mark_unhealthy(candidate)
+    async with db:
+        yield db
+
+# Dependency to get the database session
+async def get_db(response: Response):
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info["response"] = response
+        yield db
+
+# Dependency to get a read-only database session, for routes that don't write
+async def get_read_db(request: Request):
+    async with read_session(wrote_recently(request)) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
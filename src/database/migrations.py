@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from src.database.database import sync_engine
+
+# Project root, where alembic.ini lives
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+# Revision matching the schema previously built by Base.metadata.create_all
+BASELINE_REVISION = "0001"
+
+
+def get_alembic_config() -> Config:
+    """Alembic configuration usable from any working directory."""
+    config = Config(str(ROOT_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT_DIR / "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+def run_migrations(revision: str = "head") -> None:
+    """
+    Upgrade the database schema to the given revision.
+
+    Databases created before migrations existed (tables present but no version table)
+    are stamped with the baseline revision first, so only the later migrations run on them.
+    """
+    config = get_alembic_config()
+    tables = inspect(sync_engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
@@ -1,7 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, Index, Text
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from src.database.database import Base
 from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+# Amounts are stored as integer minor units (cents) to keep sums exact
+def to_minor_units(amount: float) -> int:
+    """Convert an amount in currency units to integer minor units (e.g. 12.34 -> 1234)."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor_units(amount: int) -> float:
+    """Convert integer minor units back to currency units (e.g. 1234 -> 12.34)."""
+    return amount / 100
 
 # User model
 class User(Base):
@@ -13,16 +24,90 @@ class User(Base):
     budget = Column(Float)
     role = Column(String, default="user")  # Default role is "user"
     disabled = Column(Boolean, default=False)  # Indicates if the user account is disabled
+    version = Column(Integer, nullable=False, default=1)  # Incremented by every update (optimistic concurrency)
     expenses = relationship("Expense", back_populates="owner")
 
+    # ORM updates and deletes only match the version that was loaded, and increment it
+    __mapper_args__ = {"version_id_col": version}
+
 # Expense model
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Access paths of the reports and listings: a user's expenses by date range, optionally by category
+        Index("ix_expenses_user_id_date", "user_id", "date"),
+        Index("ix_expenses_user_id_category_date", "user_id", "category", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
-    amount = Column(Float)
+    amount_cents = Column(Integer)  # Amount in minor units
     date = Column(Date, default=date.today)
     category = Column(String)
     user_id = Column(Integer, ForeignKey("users.id"))
-    owner = relationship("User", back_populates="expenses")
\ No newline at end of file
+    version = Column(Integer, nullable=False, default=1)  # Incremented by every update (optimistic concurrency)
+    owner = relationship("User", back_populates="expenses")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @hybrid_property
+    def amount(self) -> float:
+        """Amount in currency units."""
+        return from_minor_units(self.amount_cents)
+
+    @amount.inplace.setter
+    def _amount_setter(self, value: float) -> None:
+        self.amount_cents = to_minor_units(value)
+
+    @amount.inplace.expression
+    @classmethod
+    def _amount_expression(cls):
+        return cls.amount_cents / 100.0
+
+# Monthly spend rollup, maintained in the same transaction as expense writes
+class MonthlySpend(Base):
+    __tablename__ = "monthly_spend"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category = Column(String, primary_key=True)
+    total_cents = Column(Integer, nullable=False, default=0)  # Sum of the expense amounts, in minor units
+    expense_count = Column(Integer, nullable=False, default=0)
+
+# Login session, identified by the "jti" of its refresh token (the "sid" of the access tokens it issues)
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)  # No foreign key, the revocation outlives a deleted user
+    expires_at = Column(Integer, nullable=False)  # Unix time the refresh token expires at
+    revoked_at = Column(Integer, index=True)  # Unix time of the revocation, NULL while the session is active
+
+# Background report job, claimed by a job worker of any process (see src/job_manager.py)
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        # Workers claim the oldest pending job
+        Index("ix_report_jobs_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    cache_key = Column(String, nullable=False, index=True)  # Kind and data version: identical requests share a job
+    status = Column(String, nullable=False, default="pending")  # pending, running, done or failed
+    requested_by = Column(Integer)
+    progress = Column(Integer, nullable=False, default=0)  # Items processed so far
+    result = Column(Text)  # JSON result once done
+    error = Column(String)
+    created_at = Column(Integer, nullable=False)  # Unix times
+    started_at = Column(Integer)
+    finished_at = Column(Integer)
+
+# Data version of a response cache scope ("user:<id>", or "all" for cross-user data), renewed by every write of its data
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    scope = Column(String, primary_key=True)
+    token = Column(String, nullable=False)
+    modified = Column(Integer, nullable=False)  # Unix time of the last write
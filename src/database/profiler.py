@@ -0,0 +1,143 @@
+"""
+    Query profiler, enabled with DB_PROFILE=true.
+
+    Statements slower than DB_SLOW_QUERY_MS are logged with their query plan, and a request that
+    runs the same statement DB_REPEATED_STATEMENT_THRESHOLD times or more (typically a lazy load or
+    a query per item of a loop, an "N+1") is logged with the statement. Tests can also bound the
+    statements a block of code runs, profiler enabled or not:
+
+        with query_budget(3):
+            response = await client.get("/expenses/", headers=headers)
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import Engine, event
+
+from src.config import DB_REPEATED_STATEMENT_THRESHOLD, DB_SLOW_QUERY_EXPLAIN, DB_SLOW_QUERY_MS
+from src.metrics_manager import DB_REPEATED_STATEMENTS, DB_SLOW_QUERIES, RequestStats, request_stats, route_template
+
+logger = logging.getLogger("uvicorn.error")
+
+# Query plan statement of each dialect
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+# Statements a query plan can be asked for
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+
+def shorten(text: str, limit: int = 500) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def explain(conn, statement: str, parameters) -> str | None:
+    """Query plan of a statement, one line per plan node, or None if the database can't tell."""
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    # Raw DBAPI cursor: the plan query is neither timed nor profiled itself
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        # The last column holds the plan text (SQLite: id, parent, notused, detail)
+        return "\n".join(f"    {row[-1]}" for row in cursor.fetchall())
+    except Exception as e:
+        return f"    (no plan: {e})"
+    finally:
+        cursor.close()
+
+def profile_engine(engine: Engine, slow_query_ms: float = DB_SLOW_QUERY_MS,
+                   explain_slow_queries: bool = DB_SLOW_QUERY_EXPLAIN) -> None:
+    """
+    Log the slow statements run on the engine (the `sync_engine` of an async engine) and count the
+    statements of the current request, for `QueryProfilerMiddleware`.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profile_start_times"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+        if elapsed * 1000 < slow_query_ms:
+            return
+        DB_SLOW_QUERIES.inc()
+        # A plan can't be asked for a batch, nor next to a server-side cursor still being read
+        streaming = context is not None and context.execution_options.get("stream_results")
+        plan = explain(conn, statement, parameters) if explain_slow_queries and not executemany and not streaming else None
+        logger.warning("Slow query (%.1f ms): %s\n  parameters: %s%s", elapsed * 1000, shorten(statement),
+                       shorten(repr(parameters), 200), f"\n  plan:\n{plan}" if plan else "")
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware logging the statements a request repeated, added with `profile_engine` (inside MetricsMiddleware)."""
+
+    def __init__(self, app, threshold: int = DB_REPEATED_STATEMENT_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        stats = request_stats.get()
+        if scope["type"] != "http" or stats is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            repeated = {statement: count for statement, count in stats.statements.items() if count >= self.threshold}
+            if repeated:
+                route_path = route_template(scope)
+                DB_REPEATED_STATEMENTS.inc(route=route_path)
+                for statement, count in sorted(repeated.items(), key=lambda item: item[1], reverse=True):
+                    logger.warning("Likely N+1 query: %s %s ran this statement %d times: %s",
+                                   scope["method"], route_path, count, shorten(statement))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by `query_budget` (an AssertionError, reported as a test failure)."""
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: int | None = None, engines=None) -> Iterator[RequestStats]:
+    """
+    Fail if the block runs more than `max_queries` statements, or one statement more than
+    `max_repeats` times, on the application engines (or `engines`).
+
+    Every statement run meanwhile counts, whichever task or thread runs it, so the requests a test
+    client makes inside the block are included. Yields the statistics collected so far.
+    """
+    if engines is None:
+        from src.database.database import engine, read_engine, replica_engines
+
+        engines = {engine, read_engine, *replica_engines}
+    stats = RequestStats()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        stats.queries += 1
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    targets = [getattr(target, "sync_engine", target) for target in engines]
+    for target in targets:
+        event.listen(target, "after_cursor_execute", count)
+    try:
+        yield stats
+    finally:
+        for target in targets:
+            event.remove(target, "after_cursor_execute", count)
+
+    problems = []
+    if stats.queries > max_queries:
+        problems.append(f"{stats.queries} statements run, budget of {max_queries}")
+    if max_repeats is not None:
+        problems += [f"{count} times: {shorten(statement, 200)}"
+                     for statement, count in stats.statements.items() if count > max_repeats]
+    if problems:
+        most_run = sorted(stats.statements.items(), key=lambda item: item[1], reverse=True)[:5]
+        raise QueryBudgetExceeded("Query budget exceeded: " + "; ".join(problems) + "\nMost run statements:\n"
+                                  + "\n".join(f"  {count} x {shorten(statement, 200)}" for statement, count in most_run))
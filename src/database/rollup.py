@@ -0,0 +1,80 @@
+"""
+    Maintenance of the monthly spend rollup table.
+
+    Expense writes record their spend deltas and apply them in the same transaction,
+    so the rollup never drifts from the expenses. The table can be rebuilt from scratch with:
+
+        python -m src.database.rollup rebuild [--user-id ID]
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import Connection, delete, extract, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import sync_engine
+from src.database.models import Expense, MonthlySpend
+from src.database.upsert import upsert
+
+# Spend deltas keyed by (user_id, year, month, category), valued (amount in minor units, expense count)
+SpendDeltas = dict[tuple[int, int, int, str], tuple[int, int]]
+
+
+def record_spend(deltas: SpendDeltas, user_id: int, expense_date: date, category: str,
+                 amount_cents: int, sign: int = 1) -> None:
+    """Accumulate one expense (sign=1) or its removal (sign=-1) into the deltas."""
+    key = (user_id, expense_date.year, expense_date.month, category)
+    total_cents, expense_count = deltas.get(key, (0, 0))
+    deltas[key] = (total_cents + sign * amount_cents, expense_count + sign)
+
+async def apply_spend_deltas(db: AsyncSession, deltas: SpendDeltas) -> None:
+    """Add the deltas to the rollup rows with a single upsert, inside the caller's transaction."""
+    rows = [
+        {"user_id": user_id, "year": year, "month": month, "category": category,
+         "total_cents": total_cents, "expense_count": expense_count}
+        for (user_id, year, month, category), (total_cents, expense_count) in deltas.items()
+        if total_cents or expense_count
+    ]
+    await upsert(db, MonthlySpend, rows, ["user_id", "year", "month", "category"], lambda excluded: {
+        "total_cents": MonthlySpend.total_cents + excluded.total_cents,
+        "expense_count": MonthlySpend.expense_count + excluded.expense_count,
+    })
+
+def rebuild_monthly_spend(connection: Connection, user_id: int | None = None) -> int:
+    """Recompute the rollup from the expenses (of one user, or everyone), returning the number of rows written."""
+    clear = delete(MonthlySpend)
+    expenses = select(Expense).where(Expense.user_id.is_not(None), Expense.date.is_not(None),
+                                     Expense.category.is_not(None))
+    if user_id is not None:
+        clear = clear.where(MonthlySpend.user_id == user_id)
+        expenses = expenses.where(Expense.user_id == user_id)
+    expenses = expenses.subquery()
+
+    year = extract("year", expenses.c.date)
+    month = extract("month", expenses.c.date)
+    connection.execute(clear)
+    result = connection.execute(
+        insert(MonthlySpend).from_select(
+            ["user_id", "year", "month", "category", "total_cents", "expense_count"],
+            select(
+                expenses.c.user_id,
+                year,
+                month,
+                expenses.c.category,
+                func.coalesce(func.sum(expenses.c.amount_cents), 0),
+                func.count(expenses.c.id),
+            ).group_by(expenses.c.user_id, year, month, expenses.c.category),
+        )
+    )
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the monthly spend rollup table.")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recompute the rollup from the expenses")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild the rows of this user")
+    args = parser.parse_args()
+
+    with sync_engine.begin() as connection:
+        rows = rebuild_monthly_spend(connection, args.user_id)
+    print(f"Monthly spend rollup rebuilt: {rows} rows written")
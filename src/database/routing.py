@@ -0,0 +1,38 @@
+import itertools
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine a read-only session runs on.
+
+    Reads are spread round-robin over the replicas. A replica that failed to connect is skipped
+    for `retry_after` seconds, and the primary serves the reads when no replica is available.
+    Reads that must see a recent write of their client ask for the primary (see `read_session`).
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine], retry_after: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self._turn = itertools.count()
+        self._unhealthy_until: dict[AsyncEngine, float] = {}
+
+    def mark_unhealthy(self, engine: AsyncEngine) -> None:
+        self._unhealthy_until[engine] = time.monotonic() + self.retry_after
+
+    def healthy_replicas(self) -> list[AsyncEngine]:
+        now = time.monotonic()
+        return [replica for replica in self.replicas if self._unhealthy_until.get(replica, 0) <= now]
+
+    def candidates(self, primary: bool = False) -> list[AsyncEngine]:
+        """Engines to try in order: the healthy replicas starting from the next in turn, then the primary."""
+        if primary:
+            return [self.primary]
+        replicas = self.healthy_replicas()
+        if not replicas:
+            return [self.primary]
+        start = next(self._turn) % len(replicas)
+        return replicas[start:] + replicas[:start] + [self.primary]
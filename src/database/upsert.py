@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+from typing import Callable
+
+from sqlalchemy import and_, insert, literal, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Dialects with an INSERT ... ON CONFLICT DO UPDATE construct
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+async def upsert(db: AsyncSession, model, rows: list[dict], keys: list[str], set_: Callable) -> None:
+    """
+    Insert the rows, or update the existing rows with the same `keys`, inside the caller's transaction.
+
+    `set_(excluded)` gives the values of an update, where `excluded` holds the values of the
+    row being inserted (as in ON CONFLICT DO UPDATE). Databases without that construct update
+    then insert each row, and update it again if a concurrent transaction inserted it first.
+    """
+    if not rows:
+        return
+    dialect = db.bind.dialect.name
+    if dialect in UPSERT_INSERTS:
+        statement = UPSERT_INSERTS[dialect](model)
+        statement = statement.on_conflict_do_update(index_elements=keys, set_=set_(statement.excluded))
+        await db.execute(statement, rows)
+        return
+
+    for row in rows:
+        excluded = SimpleNamespace(**{name: literal(value) for name, value in row.items()})
+        statement = (
+            update(model)
+            .where(and_(*(getattr(model, key) == row[key] for key in keys)))
+            .values(set_(excluded))
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(statement)).rowcount:
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(model).values(row))
+        except IntegrityError:
+            await db.execute(statement)
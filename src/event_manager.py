@@ -0,0 +1,174 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+import orjson
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import EVENT_BROKER, EVENT_BROKER_REDIS_URL, EVENT_QUEUE_SIZE
+from src.database.models import MonthlySpend, User, from_minor_units
+from src.database.rollup import SpendDeltas
+from src.metrics_manager import EVENTS_DROPPED
+
+# Channel of the spend events published by the expense and budget writes
+SPEND_CHANNEL = "spend"
+
+# Spend change of a write per (user_id, year, month), in minor units
+MonthDeltas = dict[tuple[int, int, int], int]
+
+
+class LocalBroker:
+    """Delivers the published events to the subscribers of this process only."""
+
+    shared = False
+
+    def __init__(self):
+        self.dispatch = lambda channel, payload: None  # No subscriber can exist before the bus is started
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        self.dispatch(channel, payload)
+
+    async def start(self, dispatch) -> None:
+        self.dispatch = dispatch
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """
+    Relays the events through Redis pub/sub, so the subscribers of every worker receive them.
+
+    Each process holds a single Redis subscription and fans the events out to its local subscribers.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "expense-tracker:events:"):
+        self.client = client
+        self.prefix = prefix
+        self._listener: asyncio.Task | None = None
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        await self.client.publish(self.prefix + channel, payload)
+
+    async def start(self, dispatch) -> None:
+        pubsub = self.client.pubsub()
+        await pubsub.psubscribe(self.prefix + "*")
+
+        async def listen():
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    channel = message["channel"].decode().removeprefix(self.prefix)
+                    dispatch(channel, message["data"])
+
+        self._listener = asyncio.create_task(listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+
+
+def create_broker(name: str = EVENT_BROKER):
+    """Build the event broker selected in the configuration."""
+    if name == "local":
+        return LocalBroker()
+    if name == "redis":
+        from redis.asyncio import from_url  # Optional dependency, only needed with this broker
+
+        return RedisBroker(from_url(EVENT_BROKER_REDIS_URL))
+    raise ValueError(f"Unknown event broker: {name}")
+
+
+class EventBus:
+    """
+    Publish/subscribe of JSON events between the writes and the long-lived streams.
+
+    Every subscriber gets a bounded queue. A subscriber too slow to keep up loses its oldest
+    events rather than holding memory or slowing the publishers down.
+    """
+
+    def __init__(self, broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    async def start(self) -> None:
+        await self.broker.start(self._dispatch)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    def has_subscribers(self, channel: str) -> bool:
+        """Whether an event of `channel` can reach anyone (always assumed with a shared broker)."""
+        return self.broker.shared or bool(self._subscribers.get(channel))
+
+    async def publish(self, channel: str, *events: dict) -> None:
+        for event in events:
+            await self.broker.publish(channel, orjson.dumps(event))
+
+    @contextmanager
+    def subscribe(self, channel: str) -> Iterator[asyncio.Queue]:
+        """Queue receiving the events of `channel` until the block exits."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[channel].discard(queue)
+
+    def _dispatch(self, channel: str, payload: bytes) -> None:
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return
+        event = orjson.loads(payload)  # Decoded once for all the subscribers
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+                EVENTS_DROPPED.inc(channel=channel)
+            queue.put_nowait(event)
+
+
+def month_deltas(deltas: SpendDeltas) -> MonthDeltas:
+    """Spend change per user month of the per-category deltas of a write."""
+    months: MonthDeltas = {}
+    for (user_id, year, month, _), (total_cents, _) in deltas.items():
+        months[user_id, year, month] = months.get((user_id, year, month), 0) + total_cents
+    return months
+
+async def spend_events(db: AsyncSession, months: MonthDeltas, budget_change: float = 0.0) -> list[dict]:
+    """
+    Spend events of a write, read in its transaction once its spend deltas are applied and before
+    its budget change (`budget_change`, added to the stored budget) is: the month spending and
+    the budget of every user month it touched, before and after the write.
+
+    Nothing is read when no stream can receive the events.
+    """
+    if not months or not event_bus.has_subscribers(SPEND_CHANNEL):
+        return []
+    query = (
+        select(MonthlySpend.user_id, MonthlySpend.year, MonthlySpend.month, User.username, User.budget,
+               func.sum(MonthlySpend.total_cents).label("total_cents"))
+        .join(User, User.id == MonthlySpend.user_id)
+        .where(tuple_(MonthlySpend.user_id, MonthlySpend.year, MonthlySpend.month).in_(list(months)))
+        .group_by(MonthlySpend.user_id, MonthlySpend.year, MonthlySpend.month, User.username, User.budget)
+    )
+    return [
+        {
+            "user_id": row.user_id,
+            "username": row.username,
+            "year": row.year,
+            "month": row.month,
+            "spent_before": from_minor_units(row.total_cents - months[row.user_id, row.year, row.month]),
+            "spent": from_minor_units(row.total_cents),
+            "budget_before": row.budget,
+            "budget": None if row.budget is None else row.budget + budget_change,
+        }
+        for row in await db.execute(query)
+    ]
+
+
+# Event bus of this process
+event_bus = EventBus(create_broker(), EVENT_QUEUE_SIZE)
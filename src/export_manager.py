@@ -0,0 +1,133 @@
+import csv
+import io
+import tempfile
+from datetime import date
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from src.config import EXPORT_CHUNK_SIZE
+from src.database.database import read_session
+from src.database.models import Expense, from_minor_units
+
+# Exported columns, in order
+EXPORT_COLUMNS = ("id", "date", "category", "description", "amount")
+
+# Size of the pieces a spooled Parquet file is sent in
+FILE_CHUNK_SIZE = 1024 * 1024
+
+
+async def iter_expense_chunks(user_id: int, start: date, end: date, primary: bool = False,
+                              chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[list[tuple]]:
+    """
+    Yield a user's expenses dated in [start, end) as lists of rows, fetched chunk by chunk from a server-side cursor.
+
+    `primary` reads from the primary, for a client that just wrote.
+    """
+    query = (
+        select(Expense.id, Expense.date, Expense.category, Expense.description, Expense.amount_cents)
+        .where(Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+        .order_by(Expense.date, Expense.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async with read_session(primary) as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield [
+                (row.id, row.date, row.category, row.description, from_minor_units(row.amount_cents))
+                for row in partition
+            ]
+
+async def to_csv(chunks: AsyncIterator[list[tuple]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def to_ndjson(chunks: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield b"".join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+def _to_dataframe(rows: list[tuple]):
+    import pandas as pd  # Heavy, only imported when a columnar export is requested
+
+    frame = pd.DataFrame.from_records(rows, columns=EXPORT_COLUMNS)
+    frame["date"] = pd.to_datetime(frame["date"]).dt.date
+    return frame
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("category", pa.string()),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+    ])
+
+async def to_arrow(chunks: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """Arrow IPC stream, one record batch per chunk, sent as soon as it is encoded."""
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    buffer = io.BytesIO()
+    writer = pa.ipc.new_stream(buffer, schema)
+
+    def write(rows):
+        writer.write_table(pa.Table.from_pandas(_to_dataframe(rows), schema=schema, preserve_index=False))
+
+    def drain() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    async for rows in chunks:
+        await run_in_threadpool(write, rows)
+        yield drain()
+    writer.close()
+    yield drain()
+
+async def to_parquet(chunks: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """
+    Parquet file, one row group per chunk.
+
+    Parquet ends with a footer describing every row group, so the file is spooled to a temporary
+    file (kept in memory up to FILE_CHUNK_SIZE) and sent once complete.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    with tempfile.SpooledTemporaryFile(max_size=FILE_CHUNK_SIZE) as spool:
+        writer = pq.ParquetWriter(spool, schema)
+
+        def write(rows):
+            writer.write_table(pa.Table.from_pandas(_to_dataframe(rows), schema=schema, preserve_index=False))
+
+        async for rows in chunks:
+            await run_in_threadpool(write, rows)
+        writer.close()
+        spool.seek(0)
+        while data := spool.read(FILE_CHUNK_SIZE):
+            yield data
+
+# Serializer and media type of each export format
+EXPORT_FORMATS = {
+    "csv": (to_csv, "text/csv"),
+    "ndjson": (to_ndjson, "application/x-ndjson"),
+    "arrow": (to_arrow, "application/vnd.apache.arrow.stream"),
+    "parquet": (to_parquet, "application/vnd.apache.parquet"),
+}
+
+# Formats that need pandas and pyarrow installed
+COLUMNAR_FORMATS = ("arrow", "parquet")
@@ -0,0 +1,144 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+
+# Decoded records are (row number, parsed object or the error that prevented parsing)
+Record = tuple[int, dict | Exception]
+
+# Content types accepted by the bulk endpoints
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+CSV_TYPES = ("text/csv", "application/csv")
+JSON_TYPES = ("application/json",)
+
+# Largest single record accepted, so a malformed body can't make us buffer it whole
+MAX_RECORD_SIZE = 1024 * 1024
+
+
+class MalformedPayload(ValueError):
+    """The request body can't be decoded any further (as opposed to a single invalid row)."""
+
+
+async def iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a byte stream as UTF-8 (without BOM), keeping multi-byte characters split across chunks intact.
+
+    Raises MalformedPayload with the byte offset of the first invalid sequence.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    received = 0  # Bytes of the stream passed to the decoder so far
+
+    def decode(chunk: bytes, final: bool = False) -> str:
+        nonlocal received
+        # Bytes of an incomplete character held back from the previous chunks
+        held = len(decoder.getstate()[0])
+        try:
+            return decoder.decode(chunk, final)
+        except UnicodeDecodeError as e:
+            raise MalformedPayload(f"The body is not valid UTF-8 (byte {received - held + e.start})") from e
+        finally:
+            received += len(chunk)
+
+    async for chunk in chunks:
+        text = decode(chunk)
+        if text:
+            yield text
+    text = decode(b"", final=True)
+    if text:
+        yield text
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into lines, holding at most one partial line in memory."""
+    pending = ""
+    async for text in iter_text(chunks):
+        pending += text
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > MAX_RECORD_SIZE:
+            raise MalformedPayload(f"Line longer than {MAX_RECORD_SIZE} characters")
+    if pending:
+        yield pending.rstrip("\r")
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Yield one record per non-empty line of newline-delimited JSON."""
+    row = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, e
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Yield one record per CSV line, keyed by the header line (quoted values can't span lines)."""
+    header = None
+    row = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells are treated as missing values
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Yield the elements of a top-level JSON array as soon as each one is complete."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    state = "start"  # start -> value -> separator -> value ... -> end
+    row = 0
+    async for text in iter_text(chunks):
+        buffer = buffer[position:] + text
+        position = 0
+        while state != "end":
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if state == "start":
+                if char != "[":
+                    raise MalformedPayload("Expected a JSON array")
+                position += 1
+                state = "first"
+            elif state in ("first", "separator") and char == "]":
+                position += 1
+                state = "end"
+            elif state == "separator":
+                if char != ",":
+                    raise MalformedPayload(f"Expected ',' or ']' at row {row}")
+                position += 1
+                state = "value"
+            else:
+                try:
+                    value, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if len(buffer) - position > MAX_RECORD_SIZE:
+                        raise MalformedPayload(f"Malformed or oversized JSON element at row {row + 1}")
+                    break  # Incomplete element, wait for more data
+                row += 1
+                yield row, value
+                state = "separator"
+    if state != "end":
+        raise MalformedPayload(f"Unterminated or malformed JSON array after row {row}")
+
+def get_record_reader(content_type: str):
+    """Return the record reader matching a content type, or None if it isn't supported."""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in NDJSON_TYPES:
+        return iter_ndjson
+    if media_type in CSV_TYPES:
+        return iter_csv
+    if media_type in JSON_TYPES:
+        return iter_json_array
+    return None
@@ -0,0 +1,198 @@
+"""
+    Background report jobs.
+
+    Jobs are rows of the `report_jobs` table. Any process can submit one, and the asyncio workers
+    of any process claim it with a conditional update, so the API workers, or a separate process
+    started with `REPORT_JOB_WORKERS=0` on the API side, share the work:
+
+        python -m src.job_manager [--workers N]
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+import orjson
+from sqlalchemy import and_, or_, select, update
+
+from src.config import (
+    REPORT_JOB_CHUNK_SIZE,
+    REPORT_JOB_POLL_SECONDS,
+    REPORT_JOB_RESULT_TTL_SECONDS,
+    REPORT_JOB_TIMEOUT_SECONDS,
+    REPORT_JOB_WORKERS,
+)
+from src.database.database import AsyncSessionLocal, read_session
+from src.database.models import ReportJob
+from src.report_manager import rank_by_total, user_totals_page
+from src.response_manager import encode_json
+
+logger = logging.getLogger("uvicorn.error")
+
+# Progress callback of a job, given the number of items processed so far
+Progress = Callable[[int], Awaitable[None]]
+
+
+async def all_users_report(progress: Progress, chunk_size: int = REPORT_JOB_CHUNK_SIZE) -> list[dict]:
+    """Report of every user, aggregated one keyset page of users at a time and ranked once complete."""
+    reports: list[dict] = []
+    after = 0
+    while True:
+        async with read_session() as db:
+            page = await user_totals_page(db, after, chunk_size)
+        reports.extend(page)
+        await progress(len(reports))
+        if len(page) < chunk_size:
+            return rank_by_total(reports)
+        after = page[-1]["user_id"]
+
+# Computation of each job kind
+JOB_KINDS: dict[str, Callable[[Progress], Awaitable[Any]]] = {
+    "all_users": all_users_report,
+}
+
+
+def job_cache_key(kind: str, data_version: str) -> str:
+    """Identical requests on unchanged data share the same key, and so the same job and result."""
+    return hashlib.sha256(f"{kind}|{data_version}".encode()).hexdigest()[:32]
+
+
+class JobManager:
+    """
+    Pool of asyncio workers running the report jobs stored in the database.
+
+    A submitted job wakes up the workers of its process; idle workers also poll the table every
+    `poll_interval` seconds for jobs submitted to other processes. A job still running after
+    `timeout` seconds is considered lost (its process died) and can be claimed again.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, timeout: float, result_ttl: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def submit(self, kind: str, data_version: str, requested_by: int | None = None) -> ReportJob:
+        """
+        Queue a job, or return the job already queued, running or recently done for the same
+        request on the same data version.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown report job kind: {kind}")
+        cache_key = job_cache_key(kind, data_version)
+        now = int(time.time())
+        async with AsyncSessionLocal() as db:
+            existing = await db.scalar(
+                select(ReportJob)
+                .where(ReportJob.cache_key == cache_key,
+                       or_(ReportJob.status.in_(("pending", "running")), ReportJob.finished_at >= now - self.result_ttl))
+                .where(ReportJob.status != "failed")
+                .order_by(ReportJob.created_at.desc())
+                .limit(1)
+            )
+            if existing is not None:
+                return existing
+            job = ReportJob(id=uuid.uuid4().hex, kind=kind, cache_key=cache_key, status="pending",
+                            requested_by=requested_by, progress=0, created_at=now)
+            db.add(job)
+            await db.commit()
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> ReportJob | None:
+        # On the primary: the job table changes too often for replicas
+        async with AsyncSessionLocal() as db:
+            return await db.get(ReportJob, job_id)
+
+    async def claim(self) -> ReportJob | None:
+        """Take the oldest pending (or lost) job, or return None if there is none."""
+        now = int(time.time())
+        claimable = or_(ReportJob.status == "pending",
+                        and_(ReportJob.status == "running", ReportJob.started_at < now - self.timeout))
+        async with AsyncSessionLocal() as db:
+            job = await db.scalar(select(ReportJob).where(claimable).order_by(ReportJob.created_at).limit(1))
+            if job is None:
+                return None
+            # Only one worker wins the job: for the others it no longer matches what they read
+            unchanged = (ReportJob.started_at.is_(None) if job.started_at is None
+                         else ReportJob.started_at == job.started_at)
+            claimed = await db.execute(
+                update(ReportJob)
+                .where(ReportJob.id == job.id, ReportJob.status == job.status, unchanged)
+                .values(status="running", started_at=now, progress=0)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return job if claimed.rowcount == 1 else None
+
+    async def _update(self, job_id: str, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(ReportJob).where(ReportJob.id == job_id).values(**values))
+            await db.commit()
+
+    async def run(self, job: ReportJob) -> None:
+        async def progress(count: int) -> None:
+            await self._update(job.id, progress=count)
+
+        started = time.perf_counter()
+        try:
+            result = await JOB_KINDS[job.kind](progress)
+        except Exception as e:
+            logger.exception("Report job %s (%s) failed", job.id, job.kind)
+            await self._update(job.id, status="failed", error=str(e)[:500], finished_at=int(time.time()))
+            return
+        await self._update(job.id, status="done", result=encode_json(result).decode(), finished_at=int(time.time()))
+        logger.info("Report job %s (%s) done in %.1f s", job.id, job.kind, time.perf_counter() - started)
+
+    async def worker(self) -> None:
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Report job claim failed")
+                job = None
+            if job is not None:
+                await self.run(job)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def load_result(job: ReportJob) -> Any:
+    return orjson.loads(job.result) if job.result is not None else None
+
+
+# Report jobs of this process
+job_manager = JobManager(REPORT_JOB_WORKERS, REPORT_JOB_POLL_SECONDS, REPORT_JOB_TIMEOUT_SECONDS,
+                         REPORT_JOB_RESULT_TTL_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run report job workers outside of the API processes.")
+    parser.add_argument("--workers", type=int, default=max(REPORT_JOB_WORKERS, 1), help="Concurrent jobs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def serve() -> None:
+        job_manager.workers = args.workers
+        job_manager.start()
+        await asyncio.gather(*job_manager._tasks)
+
+    asyncio.run(serve())
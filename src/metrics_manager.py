@@ -0,0 +1,213 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import Engine, event
+
+# Default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def escape_label_value(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    """Base of the metric types: a family of values indexed by label values, in the Prometheus text format."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: dict | None = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state["buckets"][index] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, state in self._values.items():
+            for bound, count in zip(self.buckets, state["buckets"]):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': repr(bound)})} {count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {state['count']}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state['sum']}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {state['count']}")
+        return lines
+
+
+# Every metric created in this process, in creation order
+REGISTRY: list[Metric] = []
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+################### APPLICATION METRICS ###################
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests.", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.")
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries", "Database statements executed per HTTP request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250))
+DB_TIME_PER_REQUEST = Histogram(
+    "http_request_db_seconds", "Time spent in database statements per HTTP request.", ("route",))
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Latency of database statements.")
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Time to hash or verify a password, including the wait for a worker.",
+    ("operation",))
+JWT_DURATION = Histogram(
+    "jwt_duration_seconds", "Time to encode or verify a JWT.", ("operation",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05))
+JWT_VERIFY_CACHE = Counter(
+    "jwt_verify_cache_total", "Token verifications answered from the verified token cache or not.", ("result",))
+LOGIN_RATE_LIMITED = Counter(
+    "login_rate_limited_total", "Login attempts rejected by the rate limiter, by bucket key.", ("key",))
+TOKEN_REVOCATIONS = Gauge(
+    "token_revocations", "Revoked login sessions held in memory.")
+ALERT_STREAMS = Gauge(
+    "alert_streams", "Open alert event streams.")
+EVENTS_DROPPED = Counter(
+    "events_dropped_total", "Events dropped because a subscriber was too slow to keep up.", ("channel",))
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "Database statements slower than DB_SLOW_QUERY_MS (query profiler).")
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements_total", "Requests repeating an identical statement, a likely N+1 (query profiler).",
+    ("route",))
+STARTUP_DURATION = Gauge(
+    "startup_duration_seconds", "Time spent in each step of the worker startup.", ("step",))
+
+
+################### PER-REQUEST DATABASE STATISTICS ###################
+
+@dataclass
+class RequestStats:
+    """Database work done while serving one request."""
+    queries: int = 0
+    db_time: float = 0.0
+    statements: dict[str, int] = field(default_factory=dict)  # Executions per statement, filled by the query profiler
+
+# Statistics of the request being served by the current task, if any
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement run on the engine (the `sync_engine` of an async engine) and attribute it to the request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_times"].pop()
+        DB_QUERY_DURATION.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+################### MIDDLEWARE ###################
+
+def route_template(scope) -> str:
+    """Path template of the route that served the request, prefix included ("/users/update/{user_id}/")."""
+    # Included routers keep their routes as declared (path without the prefix), FastAPI records the
+    # full path of the matched route in the request scope
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or getattr(scope.get("route"), "path", "unmatched")
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and database work per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            # The route template keeps the label cardinality bounded
+            route_path = route_template(scope)
+            REQUEST_DURATION.observe(elapsed, method=scope["method"], route=route_path, status=status_code)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, route=route_path)
+            DB_TIME_PER_REQUEST.observe(stats.db_time, route=route_path)
+            request_stats.reset(token)
@@ -1,5 +1,13 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from src.config import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_MAX_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+from src.metrics_manager import PASSWORD_HASH_DURATION
+
 # Password hashing context
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
@@ -9,4 +17,67 @@ def get_password_hash(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify a plain password and return a new hash when the stored one is deprecated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing in a bounded worker pool so that Argon2 never blocks the event loop.
+
+    At most `max_workers` hashes run at the same time and at most `queue_limit` more may wait
+    for a worker. Any request beyond that is rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, executor_type: str, max_workers: int, queue_limit: int):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor type: {executor_type}")
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor: Executor | None = None
+        self._pending = 0
+
+    @property
+    def executor(self) -> Executor:
+        """Create the worker pool on first use."""
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_workers + self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations, please retry later",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_DURATION.observe(time.perf_counter() - start, operation=func.__name__)
+
+    async def hash(self, password: str) -> str:
+        """Hash a plain password in the worker pool."""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a plain password in the worker pool."""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Verify a plain password in the worker pool, returning a replacement hash if the stored one is deprecated."""
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+
+# Shared hasher used by the routers
+password_hasher = PasswordHasher(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_MAX_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
@@ -0,0 +1,129 @@
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+from src.cache_manager import TTLCache
+from src.config import (
+    LOGIN_IP_BURST,
+    LOGIN_IP_PER_MINUTE,
+    LOGIN_RATE_LIMIT_BACKEND,
+    LOGIN_RATE_LIMIT_ENABLED,
+    LOGIN_RATE_LIMIT_MAX_KEYS,
+    LOGIN_RATE_LIMIT_REDIS_URL,
+    LOGIN_USERNAME_BURST,
+    LOGIN_USERNAME_PER_MINUTE,
+)
+from src.metrics_manager import LOGIN_RATE_LIMITED
+
+
+class LocalRateLimitBackend:
+    """Token buckets inside the worker process (each worker enforces its own limits)."""
+
+    def __init__(self, max_keys: int):
+        # A bucket left alone until it is full again is the same as a new one, so it can expire then
+        self.buckets = TTLCache(max_size=max_keys, ttl=float("inf"))
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / refill_per_second
+        if not wait:
+            tokens -= 1
+        self.buckets.set(key, (tokens, now), ttl=(capacity - tokens) / refill_per_second)
+        return wait
+
+
+class RedisRateLimitBackend:
+    """Token buckets in Redis, shared by all workers, each one updated atomically by a Lua script."""
+
+    SCRIPT = """
+        local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+        local tokens = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        local wait = 0
+        if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+        redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+        redis.call("EXPIRE", KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, client, prefix: str = "expense-tracker:rate:"):
+        self.prefix = prefix
+        self.script = client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        wait = await self.script(keys=[self.prefix + key], args=[capacity, refill_per_second, time.time()])
+        return float(wait)
+
+
+def create_rate_limit_backend(name: str = LOGIN_RATE_LIMIT_BACKEND):
+    """Build the rate limit backend selected in the configuration."""
+    if name == "local":
+        return LocalRateLimitBackend(max_keys=LOGIN_RATE_LIMIT_MAX_KEYS)
+    if name == "redis":
+        from redis.asyncio import from_url  # Optional dependency, only needed with this backend
+
+        return RedisRateLimitBackend(from_url(LOGIN_RATE_LIMIT_REDIS_URL))
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+class RateLimiter:
+    """
+    Token bucket per key: up to `burst` attempts at once, then `per_minute` attempts per minute.
+
+    Checking a key only touches the backend, so a rejected attempt costs microseconds
+    instead of a database lookup and an Argon2 verification.
+    """
+
+    def __init__(self, backend, name: str, burst: int, per_minute: float):
+        # Checked here, so a misconfiguration stops the startup instead of failing the logins
+        if burst < 1:
+            raise ValueError(f"Rate limit {name!r}: the burst must be at least 1, got {burst}")
+        if not per_minute > 0:
+            raise ValueError(f"Rate limit {name!r}: the rate per minute must be positive, got {per_minute}")
+        self.backend = backend
+        self.name = name
+        self.burst = burst
+        self.refill_per_second = per_minute / 60
+
+    async def acquire(self, key: str) -> float:
+        """Take one attempt from the bucket of `key`, returning 0 if allowed or the seconds until it would be."""
+        return await self.backend.take(f"{self.name}:{key}", self.burst, self.refill_per_second)
+
+    async def check(self, key: str) -> None:
+        """Take one attempt from the bucket of `key`, answering 429 with a Retry-After header if it is empty."""
+        wait = await self.acquire(key)
+        if wait:
+            LOGIN_RATE_LIMITED.inc(key=self.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+
+def client_ip(request: Request) -> str:
+    """Address of the client (behind a proxy, run uvicorn with --forwarded-allow-ips so it is the real one)."""
+    return request.client.host if request.client else "unknown"
+
+async def check_login_rate(request: Request, username: str) -> None:
+    """
+    Rate limit a login attempt by client IP, then by username.
+
+    The IP is checked first, so a client that is already blocked cannot drain the
+    bucket of the accounts it targets and lock their owners out.
+    """
+    if not LOGIN_RATE_LIMIT_ENABLED:
+        return
+    await login_ip_limiter.check(client_ip(request))
+    await login_username_limiter.check(username.lower())
+
+
+# Login limiters, sharing the configured backend
+rate_limit_backend = create_rate_limit_backend()
+login_ip_limiter = RateLimiter(rate_limit_backend, "ip", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE)
+login_username_limiter = RateLimiter(rate_limit_backend, "username", LOGIN_USERNAME_BURST, LOGIN_USERNAME_PER_MINUTE)
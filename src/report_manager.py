@@ -0,0 +1,190 @@
+from datetime import date
+
+from sqlalchemy import case, extract, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Expense, MonthlySpend, User, from_minor_units
+
+
+def month_bounds(year: int, month: int) -> tuple[date, date]:
+    """Return the first day of the month and the first day of the following month."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+async def totals_by_category(db: AsyncSession, user_id: int, start: date, end: date) -> list[dict]:
+    """Total, count and share of the period total per category, for expenses dated in [start, end)."""
+    total = func.sum(Expense.amount_cents)
+    query = (
+        select(
+            Expense.category,
+            total.label("total"),
+            func.count(Expense.id).label("count"),
+            (total * 1.0 / func.sum(total).over()).label("share"),
+        )
+        .where(Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+        .group_by(Expense.category)
+        .order_by(total.desc())
+    )
+    result = await db.execute(query)
+    return [
+        {"category": row.category, "total": from_minor_units(row.total), "count": row.count, "share": round(row.share, 4)}
+        for row in result
+    ]
+
+async def monthly_totals_by_category(db: AsyncSession, user_id: int, year: int, month: int) -> list[dict]:
+    """Total, count and share of the month total per category, read from the monthly spend rollup."""
+    query = (
+        select(
+            MonthlySpend.category,
+            MonthlySpend.total_cents.label("total"),
+            MonthlySpend.expense_count.label("count"),
+            (MonthlySpend.total_cents * 1.0 / func.sum(MonthlySpend.total_cents).over()).label("share"),
+        )
+        .where(
+            MonthlySpend.user_id == user_id,
+            MonthlySpend.year == year,
+            MonthlySpend.month == month,
+            MonthlySpend.expense_count > 0,
+        )
+        .order_by(MonthlySpend.total_cents.desc())
+    )
+    result = await db.execute(query)
+    return [
+        {"category": row.category, "total": from_minor_units(row.total), "count": row.count,
+         "share": round(row.share or 0.0, 4)}
+        for row in result
+    ]
+
+async def totals_by_day(db: AsyncSession, user_id: int, start: date, end: date) -> list[dict]:
+    """Total per day with the running total of the period, for expenses dated in [start, end)."""
+    total = func.sum(Expense.amount_cents)
+    query = (
+        select(
+            Expense.date,
+            total.label("total"),
+            func.sum(total).over(order_by=Expense.date).label("cumulative_total"),
+        )
+        .where(Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+        .group_by(Expense.date)
+        .order_by(Expense.date)
+    )
+    result = await db.execute(query)
+    return [
+        {"date": row.date, "total": from_minor_units(row.total), "cumulative_total": from_minor_units(row.cumulative_total)}
+        for row in result
+    ]
+
+async def totals_by_month(db: AsyncSession, user_id: int, start: date, end: date) -> list[dict]:
+    """Total per calendar month with the running total of the period, for expenses dated in [start, end)."""
+    year = extract("year", Expense.date)
+    month = extract("month", Expense.date)
+    total = func.sum(Expense.amount_cents)
+    query = (
+        select(
+            year.label("year"),
+            month.label("month"),
+            total.label("total"),
+            func.sum(total).over(order_by=(year, month)).label("cumulative_total"),
+        )
+        .where(Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+        .group_by(year, month)
+        .order_by(year, month)
+    )
+    result = await db.execute(query)
+    return [
+        {
+            "year": int(row.year),
+            "month": int(row.month),
+            "total": from_minor_units(row.total),
+            "cumulative_total": from_minor_units(row.cumulative_total),
+        }
+        for row in result
+    ]
+
+def summarize(categories: list[dict]) -> dict:
+    """Overall total and count of a per-category breakdown."""
+    return {
+        "total": round(sum((category["total"] for category in categories), 0.0), 2),
+        "expense_count": sum(category["count"] for category in categories),
+        "by_category": categories,
+    }
+
+def month_spend_cents(day: date):
+    """Sum of the joined rollup rows of the month of `day`, in minor units."""
+    in_month = (MonthlySpend.year == day.year) & (MonthlySpend.month == day.month)
+    return func.coalesce(func.sum(case((in_month, MonthlySpend.total_cents), else_=0)), 0)
+
+def left_of(budget: float | None, spent_cents: int) -> float | None:
+    return None if budget is None else budget - from_minor_units(spent_cents)
+
+async def totals_by_user(db: AsyncSession) -> list[dict]:
+    """
+    Total expenses of every user, ranked by spending, and the budget left for the current month,
+    computed in a single grouped query over the rollup.
+    """
+    total = func.coalesce(func.sum(MonthlySpend.total_cents), 0)
+    query = (
+        select(
+            User.id,
+            User.username,
+            User.budget,
+            total.label("total_expenses"),
+            func.coalesce(func.sum(MonthlySpend.expense_count), 0).label("expense_count"),
+            month_spend_cents(date.today()).label("month_cents"),
+            func.rank().over(order_by=total.desc()).label("rank"),
+        )
+        .outerjoin(MonthlySpend, MonthlySpend.user_id == User.id)
+        .group_by(User.id, User.username, User.budget)
+        .order_by(User.id)
+    )
+    result = await db.execute(query)
+    return [
+        {
+            "user_id": row.id,
+            "username": row.username,
+            "total_expenses": from_minor_units(row.total_expenses),
+            "expense_count": row.expense_count,
+            "remaining_budget": left_of(row.budget, row.month_cents),
+            "rank": row.rank,
+        }
+        for row in result
+    ]
+
+async def user_totals_page(db: AsyncSession, after: int = 0, limit: int = 1000) -> list[dict]:
+    """Total expenses of up to `limit` users with an id above `after`, by increasing id (a keyset page of `totals_by_user`)."""
+    query = (
+        select(
+            User.id,
+            User.username,
+            User.budget,
+            func.coalesce(func.sum(MonthlySpend.total_cents), 0).label("total_expenses"),
+            func.coalesce(func.sum(MonthlySpend.expense_count), 0).label("expense_count"),
+            month_spend_cents(date.today()).label("month_cents"),
+        )
+        .outerjoin(MonthlySpend, MonthlySpend.user_id == User.id)
+        .where(User.id > after)
+        .group_by(User.id, User.username, User.budget)
+        .order_by(User.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [
+        {
+            "user_id": row.id,
+            "username": row.username,
+            "total_expenses": from_minor_units(row.total_expenses),
+            "expense_count": row.expense_count,
+            "remaining_budget": left_of(row.budget, row.month_cents),
+        }
+        for row in result
+    ]
+
+def rank_by_total(reports: list[dict]) -> list[dict]:
+    """Set the spending rank of every user report (same semantics as SQL RANK(): ties share a rank)."""
+    previous_total, rank = None, 0
+    for position, report in enumerate(sorted(reports, key=lambda report: report["total_expenses"], reverse=True), 1):
+        if report["total_expenses"] != previous_total:
+            previous_total, rank = report["total_expenses"], position
+        report["rank"] = rank
+    return reports
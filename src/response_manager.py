@@ -1,3 +1,24 @@
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+def encode_json(content: Any) -> bytes:
+    """
+    Serialize content to JSON bytes without the generic `jsonable_encoder` walk: Pydantic models
+    go through their compiled serializer, anything else through orjson (which handles dates natively).
+    """
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
 class ResponseManager:
     responses = {
         200: {"description": "OK"},
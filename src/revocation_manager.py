@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Iterable
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import (
+    TOKEN_REVOCATION_BLOOM_CAPACITY,
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+    TOKEN_REVOCATION_REBUILD_SECONDS,
+    TOKEN_REVOCATION_SYNC_SECONDS,
+)
+from src.database.database import AsyncSessionLocal, read_session
+from src.database.models import RefreshToken
+from src.metrics_manager import TOKEN_REVOCATIONS
+
+logger = logging.getLogger("uvicorn.error")
+
+# Revocations committed shortly before a sync may not be visible to it yet, so each sync looks back this far
+SYNC_OVERLAP_SECONDS = 60
+
+
+class BloomFilter:
+    """
+    Set membership test with false positives but no false negatives, in a fixed-size bit array.
+
+    The array is sized for `capacity` items at `error_rate`, and the bit positions of an
+    item are derived from a single BLAKE2b digest (double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked login sessions (refresh token "jti"), checked on every authenticated request.
+
+    The Bloom filter answers the common case, a session that was never revoked, and its rare
+    positives are confirmed in the exact set. Entries are only needed until the tokens they revoke
+    expire, so a periodic full reload drops the expired ones and resizes the filter.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.revoked: dict[str, int] = {}  # jti -> Unix time its refresh token expires at
+        self.synced_at: int | None = None
+        self.rebuilt_at = 0.0
+
+    def add(self, jti: str, expires_at: int) -> None:
+        self.bloom.add(jti)
+        self.revoked[jti] = expires_at
+        TOKEN_REVOCATIONS.set(len(self.revoked))
+
+    def add_all(self, rows: Iterable[tuple[str, int]]) -> None:
+        for jti, expires_at in rows:
+            self.add(jti, expires_at)
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self.bloom and jti in self.revoked
+
+    def __len__(self) -> int:
+        return len(self.revoked)
+
+    async def sync(self, full: bool = False) -> None:
+        """Load the revocations made since the last sync (by any worker), or all unexpired ones when `full`."""
+        now = int(time.time())
+        query = select(RefreshToken.jti, RefreshToken.expires_at).where(
+            RefreshToken.revoked_at.is_not(None), RefreshToken.expires_at > now)
+        full = full or self.synced_at is None
+        if not full:
+            query = query.where(RefreshToken.revoked_at >= self.synced_at - SYNC_OVERLAP_SECONDS)
+        async with read_session() as db:
+            rows = (await db.execute(query)).all()
+
+        if full:
+            # Built aside and swapped in, so requests never see a partly loaded list
+            bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+            for jti, _ in rows:
+                bloom.add(jti)
+            self.bloom, self.revoked = bloom, dict(rows)
+            self.rebuilt_at = time.monotonic()
+            TOKEN_REVOCATIONS.set(len(self.revoked))
+        else:
+            self.add_all(rows)
+        self.synced_at = now
+
+    async def run(self, interval: float = TOKEN_REVOCATION_SYNC_SECONDS,
+                  rebuild_interval: float = TOKEN_REVOCATION_REBUILD_SECONDS) -> None:
+        """Keep the list in sync until cancelled (started by the application lifespan)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                full = time.monotonic() - self.rebuilt_at >= rebuild_interval
+                if full:
+                    await purge_expired_sessions()
+                await self.sync(full=full)
+            except Exception:
+                logger.exception("Token revocation sync failed")
+
+
+async def revoke_sessions(db: AsyncSession, *conditions) -> list[tuple[str, int]]:
+    """
+    Revoke the active sessions matching the conditions, inside the caller's transaction.
+
+    Returns the revoked (jti, expires_at), to be added to `revocation_list` once committed.
+    """
+    statement = (
+        update(RefreshToken)
+        .where(RefreshToken.revoked_at.is_(None), RefreshToken.expires_at > int(time.time()), *conditions)
+        .values(revoked_at=int(time.time()))
+        .returning(RefreshToken.jti, RefreshToken.expires_at)
+    )
+    return [tuple(row) for row in (await db.execute(statement)).all()]
+
+async def purge_expired_sessions() -> None:
+    """Delete the sessions whose refresh token expired, revoked or not: no token can use them anymore."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= int(time.time())))
+        await db.commit()
+
+
+# Revoked sessions of this worker
+revocation_list = RevocationList(TOKEN_REVOCATION_BLOOM_CAPACITY, TOKEN_REVOCATION_BLOOM_ERROR_RATE)
@@ -1,37 +1,113 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from datetime import date
+from typing import Annotated, AsyncIterator, Literal
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+import orjson
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
 
-# from src.authentication_manager import get_current_user
-from src.database.database import get_db
-from src.database.models import User
+from src.alert_manager import alert_for_spend, iter_budget_alerts
+from src.authentication_manager import CurrentUser, get_current_user, is_admin, oauth2_scheme
+from src.config import ALERT_STREAM_KEEPALIVE_SECONDS
+from src.database.database import get_read_db
+from src.event_manager import SPEND_CHANNEL, event_bus
+from src.metrics_manager import ALERT_STREAMS
 from src.response_manager import ResponseManager
 
 router = APIRouter()
 
-# class AlertResponse(BaseModel):
-#     user_id: int
-#     username: str
-#     budget: float
-#     total_expenses: float
-#     alert: str
-
-# @router.get("/", responses=ResponseManager.responses, name="Get Alerts")
-# async def get_alerts(
-#     db: Annotated[Session, Depends(get_db)],
-#     current_user: Annotated[User, Depends(get_current_user)]
-# ):
-#     users = db.query(User).all()
-#     alerts = []
-#     for user in users:
-#         total_expenses = sum(expense.amount for expense in user.expenses)
-#         if total_expenses > user.budget:
-#             alerts.append(AlertResponse(
-#                 user_id=user.id,
-#                 username=user.username,
-#                 budget=user.budget,
-#                 total_expenses=total_expenses,
-#                 alert="Budget exceeded!"
-#             ))
-#     return alerts
\ No newline at end of file
+class AlertResponse(BaseModel):
+    user_id: int
+    username: str
+    budget: float
+    total_expenses: float
+    threshold: float
+    alert: str
+
+################### FUNCTIONS ###################
+
+async def as_json_array(alerts: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode alerts as a JSON array, one element at a time."""
+    separator = b""
+    yield b"["
+    async for alert in alerts:
+        yield separator + orjson.dumps(alert)
+        separator = b","
+    yield b"]"
+
+async def as_ndjson(alerts: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode alerts as newline-delimited JSON."""
+    async for alert in alerts:
+        yield orjson.dumps(alert) + b"\n"
+
+async def as_server_sent_events(user_id: int | None) -> AsyncIterator[bytes]:
+    """Alerts of one user (or of everyone) as server-sent events, as the writes cross a threshold."""
+    with event_bus.subscribe(SPEND_CHANNEL) as events:
+        ALERT_STREAMS.inc()
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), ALERT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if user_id is not None and event["user_id"] != user_id:
+                    continue
+                alert = alert_for_spend(event)
+                if alert is not None:
+                    yield b"event: alert\ndata: " + orjson.dumps(alert) + b"\n\n"
+        finally:
+            ALERT_STREAMS.dec()
+
+################### ROUTES ###################
+
+@router.get("/", name="Get Alerts", responses={
+    **ResponseManager.responses,
+    200: {"description": "Streamed list of alerts", "model": list[AlertResponse]},
+})
+async def get_alerts(
+    current_user: Annotated[CurrentUser, Depends(is_admin)],
+    year: Annotated[int | None, Query(ge=1, le=9999, description="Defaults to the current year")] = None,
+    month: Annotated[int | None, Query(ge=1, le=12, description="Defaults to the current month")] = None,
+    after: Annotated[int, Query(ge=0, description="Only users with an id greater than this one (keyset cursor)")] = 0,
+    limit: Annotated[int | None, Query(ge=1, description="Maximum number of alerts to return")] = None,
+    format: Annotated[Literal["json", "ndjson"], Query(description="Streamed JSON array or NDJSON")] = "json",
+):
+    """
+    Users whose spending for the month crossed an alert threshold (ALERT_THRESHOLDS, fractions of the budget).
+
+    Alerts are evaluated with grouped queries over the monthly rollup and streamed in user id order.
+    Pass the last `user_id` received as `after` to resume from there.
+    """
+    today = date.today()
+    alerts = iter_budget_alerts(year or today.year, month or today.month, after=after, limit=limit)
+    if format == "ndjson":
+        return StreamingResponse(as_ndjson(alerts), media_type="application/x-ndjson")
+    return StreamingResponse(as_json_array(alerts), media_type="application/json")
+
+@router.get("/stream", name="Stream Alerts", responses={
+    **ResponseManager.responses,
+    200: {"description": "Server-sent events, one `alert` event per threshold crossing",
+          "content": {"text/event-stream": {}}},
+})
+async def stream_alerts(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_read_db, scope="function")],
+):
+    """
+    Push the alerts as they happen: every expense or budget write that moves a user over a higher
+    threshold is sent as an `alert` event (JSON data), instead of clients polling `/alerts/`.
+
+    Admins receive the alerts of every user, other users their own. The database session used to
+    authenticate is released before streaming, so an open stream holds no connection.
+    """
+    current_user = await get_current_user(token, db)
+    user_id = None if current_user.role == "admin" else current_user.id
+    return StreamingResponse(
+        as_server_sent_events(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
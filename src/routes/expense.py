@@ -1,71 +1,421 @@
-from datetime import date
+import base64
+from datetime import date as date_type
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, ConfigDict, ValidationError
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-# from src.authentication_manager import get_current_user
-# from src.database.database import get_db
-# from src.database.models import Expense, User
-# from src.response_manager import ResponseManager
+from src.authentication_manager import CurrentUser, get_current_user, invalidate_user
+from src.cache_manager import response_cache
+from src.config import BULK_INSERT_CHUNK_SIZE, BULK_MAX_REPORTED_ERRORS
+from src.database.database import get_db, get_read_db
+from src.database.models import Expense, MonthlySpend, User, from_minor_units, to_minor_units
+from src.database.rollup import SpendDeltas, apply_spend_deltas, record_spend
+from src.event_manager import SPEND_CHANNEL, event_bus, month_deltas, spend_events
+from src.ingest_manager import MalformedPayload, Record, get_record_reader
+from src.response_manager import MessageResponse, ResponseManager
+from src.version_manager import check_if_match, commit_versioned, conflict_error, if_match_version, version_etag
 
 router = APIRouter()
 
-# class ExpenseCreate(BaseModel):
-#     description: str
-#     amount: float
-#     category: str
-#     date: date = None
-
-# # Predefined expense categories
-# CATEGORIES = [
-#     "Food", "Transportation", "Housing", "Utilities", "Health", "Leisure", "Dining Out", "Clothing",
-#     "Education", "Travel", "Savings and Investments", "Insurance", "Entertainment", "Gifts and Donations", "Miscellaneous"
-# ]
-
-# @router.post("/", responses=ResponseManager.responses, name="Create Expense")
-# async def create_expense(expense: ExpenseCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     if not expense.date:
-#         expense.date = date.today()
-#     if expense.category not in CATEGORIES:
-#         raise HTTPException(status_code=400, detail=f"Invalid category. Allowed categories are: {', '.join(CATEGORIES)}")
-#     db_expense = Expense(**expense.dict(), user_id=current_user.id)
-#     db.add(db_expense)
-
-#     # Automatically update the remaining budget
-#     current_user.budget -= expense.amount
-#     db.commit()
-#     db.refresh(db_expense)
-#     db.refresh(current_user)
-
-#     return {"expense": db_expense, "remaining_budget": current_user.budget}
-
-# @router.put("/{expense_id}/", responses=ResponseManager.responses, name="Update Expense")
-# async def update_expense(expense_id: int, updated_expense: ExpenseCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     """Update an existing expense for the authenticated user."""
-#     expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == current_user.id).first()
-#     if not expense:
-#         raise HTTPException(status_code=404, detail="Expense not found")
-#     for key, value in updated_expense.dict().items():
-#         setattr(expense, key, value)
-#     db.commit()
-#     db.refresh(expense)
-#     return expense
-
-# @router.delete("/{expense_id}/", responses=ResponseManager.responses, name="Delete Expense")
-# async def delete_expense(expense_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     """Delete an existing expense for the authenticated user."""
-#     expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == current_user.id).first()
-#     if not expense:
-#         raise HTTPException(status_code=404, detail="Expense not found")
-#     db.delete(expense)
-#     db.commit()
-#     return {"message": "Expense deleted successfully"}
-
-# @router.put("/budget/", responses=ResponseManager.responses, name="Update Budget")
-# async def update_budget(new_budget: float, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     """Update the global monthly budget for the authenticated user."""
-#     current_user.budget = new_budget
-#     db.commit()
-#     db.refresh(current_user)
-#     return {"message": "Budget updated successfully", "new_budget": current_user.budget}
\ No newline at end of file
+# Predefined expense categories
+CATEGORIES = [
+    "Food", "Transportation", "Housing", "Utilities", "Health", "Leisure", "Dining Out", "Clothing",
+    "Education", "Travel", "Savings and Investments", "Insurance", "Entertainment", "Gifts and Donations", "Miscellaneous"
+]
+CATEGORY_SET = frozenset(CATEGORIES)
+
+# Fields that can be requested in a listing, with the column each one is read from
+EXPENSE_FIELDS = {
+    "id": Expense.id,
+    "date": Expense.date,
+    "category": Expense.category,
+    "description": Expense.description,
+    "amount": Expense.amount_cents,
+    "version": Expense.version,
+}
+
+################### MODELS ###################
+
+class ExpenseCreate(BaseModel):
+    description: str
+    amount: float
+    category: str
+    date: date_type | None = None
+
+class ExpenseOut(BaseModel):
+    id: int
+    description: str | None = None
+    amount: float
+    category: str
+    date: date_type
+    version: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ExpenseItem(BaseModel):
+    """An expense of a listing, restricted to the requested fields."""
+    id: int | None = None
+    date: date_type | None = None
+    category: str | None = None
+    description: str | None = None
+    amount: float | None = None
+    version: int | None = None
+
+class ExpensePage(BaseModel):
+    items: list[ExpenseItem]
+    next_cursor: str | None
+
+class ExpenseCreated(BaseModel):
+    expense: ExpenseOut
+    remaining_budget: float | None
+
+class BudgetUpdated(BaseModel):
+    message: str
+    new_budget: float
+    version: int
+
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[BulkImportError]
+    errors_truncated: bool
+
+################### FUNCTIONS ###################
+
+def check_category(category: str) -> None:
+    if category not in CATEGORY_SET:
+        raise HTTPException(status_code=400, detail=f"Invalid category. Allowed categories are: {', '.join(CATEGORIES)}")
+
+async def get_user_expense(db: AsyncSession, expense_id: int, user_id: int) -> Expense:
+    result = await db.execute(select(Expense).where(Expense.id == expense_id, Expense.user_id == user_id))
+    expense = result.scalars().first()
+    if not expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    return expense
+
+async def remaining_budget(db: AsyncSession, user_id: int, day: date_type) -> float | None:
+    """Budget left for the month of `day`: the monthly budget minus the month's spending (from the rollup)."""
+    spent_cents = (
+        select(func.coalesce(func.sum(MonthlySpend.total_cents), 0))
+        .where(MonthlySpend.user_id == user_id, MonthlySpend.year == day.year, MonthlySpend.month == day.month)
+        .scalar_subquery()
+    )
+    row = (await db.execute(select(User.budget, spent_cents.label("spent_cents")).where(User.id == user_id))).first()
+    if row is None or row.budget is None:
+        return None
+    return row.budget - from_minor_units(row.spent_cents)
+
+def encode_cursor(expense_date: date_type, expense_id: int) -> str:
+    """Opaque keyset cursor pointing after the given (date, id) position."""
+    return base64.urlsafe_b64encode(f"{expense_date.isoformat()}:{expense_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[date_type, int]:
+    try:
+        expense_date, expense_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return date_type.fromisoformat(expense_date), int(expense_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+def parse_fields(fields: str | None) -> list[str]:
+    """Requested fields of a listing, all of them when not specified."""
+    if not fields:
+        return list(EXPENSE_FIELDS)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in EXPENSE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields are: {', '.join(EXPENSE_FIELDS)}",
+        )
+    return list(dict.fromkeys(requested))
+
+async def insert_expense_chunk(db: AsyncSession, user_id: int, records: list[Record]) -> tuple[int, list[dict]]:
+    """
+    Validate a chunk of decoded records and insert the valid ones in a single transaction.
+
+    Returns the number of inserted expenses and the errors of the rejected rows.
+    Publishes the spend events of the chunk once committed.
+    """
+    errors = []
+    expenses = []
+    for row, record in records:
+        if isinstance(record, Exception):
+            errors.append({"row": row, "error": str(record)})
+            continue
+        try:
+            expenses.append((row, ExpenseCreate.model_validate(record)))
+        except ValidationError as e:
+            messages = (f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in e.errors())
+            errors.append({"row": row, "error": "; ".join(messages)})
+
+    # Categories are checked once per distinct value of the chunk rather than once per row
+    invalid_categories = {expense.category for _, expense in expenses} - CATEGORY_SET
+    if invalid_categories:
+        errors.extend(
+            {"row": row, "error": f"Invalid category: {expense.category}"}
+            for row, expense in expenses if expense.category in invalid_categories
+        )
+        expenses = [(row, expense) for row, expense in expenses if expense.category not in invalid_categories]
+        errors.sort(key=lambda error: error["row"])
+    if not expenses:
+        return 0, errors
+
+    today = date_type.today()
+    values = [
+        {
+            "description": expense.description,
+            "amount_cents": to_minor_units(expense.amount),
+            "category": expense.category,
+            "date": expense.date or today,
+            "user_id": user_id,
+        }
+        for _, expense in expenses
+    ]
+    deltas: SpendDeltas = {}
+    for value in values:
+        record_spend(deltas, user_id, value["date"], value["category"], value["amount_cents"])
+
+    await db.execute(insert(Expense), values)
+    await apply_spend_deltas(db, deltas)
+    events = await spend_events(db, month_deltas(deltas))
+    await response_cache.invalidate_user(db, user_id)
+    await db.commit()
+    await event_bus.publish(SPEND_CHANNEL, *events)
+    return len(values), errors
+
+################### ROUTES ###################
+
+@router.get("/", responses=ResponseManager.responses, name="List Expenses", response_model=ExpensePage,
+            response_model_exclude_unset=True)
+async def list_expenses(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    cursor: Annotated[str | None, Query(description="The next_cursor of the previous page")] = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    order: Annotated[Literal["desc", "asc"], Query(description="By date then id")] = "desc",
+    category: str | None = None,
+    date_from: Annotated[date_type | None, Query(description="Inclusive")] = None,
+    date_to: Annotated[date_type | None, Query(description="Inclusive")] = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    fields: Annotated[str | None, Query(description="Comma-separated fields to return, e.g. date,amount")] = None,
+):
+    """
+    List the authenticated user's expenses, one page at a time.
+
+    Pages are addressed by a keyset cursor on (date, id) instead of an offset, using the
+    (user_id, date) index, so every page costs the same however deep the client scrolls.
+    Only the requested `fields` are selected from the database.
+    """
+    selected = parse_fields(fields)
+    # The cursor position is always needed, even when not returned
+    fetched = selected + [field for field in ("date", "id") if field not in selected]
+    query = select(*(EXPENSE_FIELDS[field].label(field) for field in fetched)).where(Expense.user_id == current_user.id)
+    if category is not None:
+        query = query.where(Expense.category == category)
+    if date_from is not None:
+        query = query.where(Expense.date >= date_from)
+    if date_to is not None:
+        query = query.where(Expense.date <= date_to)
+    if min_amount is not None:
+        query = query.where(Expense.amount_cents >= to_minor_units(min_amount))
+    if max_amount is not None:
+        query = query.where(Expense.amount_cents <= to_minor_units(max_amount))
+
+    position = tuple_(Expense.date, Expense.id)
+    if cursor is not None:
+        after = tuple_(*decode_cursor(cursor))
+        query = query.where(position < after if order == "desc" else position > after)
+    if order == "desc":
+        query = query.order_by(Expense.date.desc(), Expense.id.desc())
+    else:
+        query = query.order_by(Expense.date, Expense.id)
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    for row in rows:
+        item = {field: row._mapping[field] for field in selected}
+        if "amount" in item:
+            item["amount"] = from_minor_units(item["amount"])
+        items.append(item)
+    next_cursor = encode_cursor(rows[-1].date, rows[-1].id) if has_more else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.post("/", responses=ResponseManager.responses, name="Create Expense", response_model=ExpenseCreated)
+async def create_expense(
+    expense: ExpenseCreate,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)]
+):
+    if not expense.date:
+        expense.date = date_type.today()
+    check_category(expense.category)
+    db_expense = Expense(**expense.model_dump(), user_id=current_user.id)
+    db.add(db_expense)
+
+    deltas: SpendDeltas = {}
+    record_spend(deltas, current_user.id, db_expense.date, db_expense.category, db_expense.amount_cents)
+    await apply_spend_deltas(db, deltas)
+    events = await spend_events(db, month_deltas(deltas))
+    # Read in the write transaction, so concurrent expenses of the month are all accounted for
+    remaining = await remaining_budget(db, current_user.id, db_expense.date)
+    await response_cache.invalidate_user(db, current_user.id)
+    await db.commit()
+    await event_bus.publish(SPEND_CHANNEL, *events)
+
+    response.headers["ETag"] = version_etag(db_expense.version)
+    return {"expense": ExpenseOut.model_validate(db_expense), "remaining_budget": remaining}
+
+@router.put("/budget/", responses=ResponseManager.responses, name="Update Budget", response_model=BudgetUpdated)
+async def update_budget(
+    new_budget: float,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    if_match: Annotated[str | None, Header(description="Version of the user the new budget is based on")] = None,
+):
+    """
+    Update the global monthly budget for the authenticated user.
+
+    With If-Match, the budget is only replaced if the user is still at that version (412 otherwise).
+    """
+    # A lower budget can put the current month over a threshold
+    today = date_type.today()
+    budget = await db.scalar(select(User.budget).where(User.id == current_user.id))
+    events = await spend_events(db, {(current_user.id, today.year, today.month): 0},
+                                budget_change=new_budget - budget if budget is not None else 0.0)
+    statement = update(User).where(User.id == current_user.id)
+    expected = if_match_version(if_match)
+    if expected is not None:
+        statement = statement.where(User.version == expected)
+    version = await db.scalar(statement.values(budget=new_budget, version=User.version + 1).returning(User.version))
+    if version is None:
+        await db.rollback()
+        current = await db.scalar(select(User.version).where(User.id == current_user.id))
+        if current is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        check_if_match(if_match, current)
+        # The user changed and came back to the expected version between the two statements
+        raise conflict_error()
+    await response_cache.invalidate_user(db, current_user.id)
+    await db.commit()
+    invalidate_user(current_user.username)
+    await event_bus.publish(SPEND_CHANNEL, *events)
+    response.headers["ETag"] = version_etag(version)
+    return {"message": "Budget updated successfully", "new_budget": new_budget, "version": version}
+
+@router.put("/{expense_id}/", responses=ResponseManager.responses, name="Update Expense", response_model=ExpenseOut)
+async def update_expense(
+    expense_id: int,
+    updated_expense: ExpenseCreate,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    if_match: Annotated[str | None, Header(description="Version of the expense the update is based on")] = None,
+):
+    """
+    Update an existing expense for the authenticated user.
+
+    With If-Match, the update only applies to that version of the expense (412 otherwise). Without it,
+    an update racing with another one still fails with 409 instead of silently overwriting it.
+    """
+    expense = await get_user_expense(db, expense_id, current_user.id)
+    check_if_match(if_match, expense.version)
+    check_category(updated_expense.category)
+
+    deltas: SpendDeltas = {}
+    record_spend(deltas, current_user.id, expense.date, expense.category, expense.amount_cents, sign=-1)
+    for key, value in updated_expense.model_dump(exclude_none=True).items():
+        setattr(expense, key, value)
+    record_spend(deltas, current_user.id, expense.date, expense.category, expense.amount_cents)
+    await apply_spend_deltas(db, deltas)
+    events = await spend_events(db, month_deltas(deltas))
+
+    await response_cache.invalidate_user(db, current_user.id)
+    await commit_versioned(db)
+    await event_bus.publish(SPEND_CHANNEL, *events)
+    response.headers["ETag"] = version_etag(expense.version)
+    return ExpenseOut.model_validate(expense)
+
+@router.delete("/{expense_id}/", responses=ResponseManager.responses, name="Delete Expense",
+                response_model=MessageResponse)
+async def delete_expense(
+    expense_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    if_match: Annotated[str | None, Header(description="Version of the expense to delete")] = None,
+):
+    """Delete an existing expense for the authenticated user (only that version of it with If-Match)."""
+    expense = await get_user_expense(db, expense_id, current_user.id)
+    check_if_match(if_match, expense.version)
+
+    deltas: SpendDeltas = {}
+    record_spend(deltas, current_user.id, expense.date, expense.category, expense.amount_cents, sign=-1)
+    await apply_spend_deltas(db, deltas)
+    events = await spend_events(db, month_deltas(deltas))
+
+    await db.delete(expense)
+    await response_cache.invalidate_user(db, current_user.id)
+    await commit_versioned(db)
+    await event_bus.publish(SPEND_CHANNEL, *events)
+    return {"message": "Expense deleted successfully"}
+
+@router.post("/bulk", responses=ResponseManager.responses, name="Bulk Create Expenses", response_model=BulkImportResult)
+async def create_expenses_bulk(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)]
+):
+    """
+    Import many expenses at once for the authenticated user.
+
+    The body is a JSON array (`application/json`), newline-delimited JSON (`application/x-ndjson`)
+    or CSV with a header line (`text/csv`), each record having `description`, `amount`, `category`
+    and optionally `date`. The body is read as a stream and inserted in chunks of BULK_INSERT_CHUNK_SIZE
+    rows, one transaction per chunk. Invalid rows are skipped and reported with their row number.
+    """
+    reader = get_record_reader(request.headers.get("content-type", ""))
+    if reader is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected application/json, application/x-ndjson or text/csv",
+        )
+
+    inserted = 0
+    failed = 0
+    errors = []
+    chunk: list[Record] = []
+
+    async def flush():
+        nonlocal inserted, failed, chunk
+        chunk_inserted, chunk_errors = await insert_expense_chunk(db, current_user.id, chunk)
+        inserted += chunk_inserted
+        failed += len(chunk_errors)
+        errors.extend(chunk_errors[:BULK_MAX_REPORTED_ERRORS - len(errors)])
+        chunk = []
+
+    try:
+        async for record in reader(request.stream()):
+            chunk.append(record)
+            if len(chunk) >= BULK_INSERT_CHUNK_SIZE:
+                await flush()
+        if chunk:
+            await flush()
+    except MalformedPayload as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": str(e), "inserted": inserted, "failed": failed, "errors": errors},
+        ) from e
+
+    return {"inserted": inserted, "failed": failed, "errors": errors, "errors_truncated": failed > len(errors)}
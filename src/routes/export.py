@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+from importlib.util import find_spec
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.authentication_manager import CurrentUser, get_current_user
+from src.database.database import get_read_db, wrote_recently
+from src.export_manager import COLUMNAR_FORMATS, EXPORT_FORMATS, iter_expense_chunks
+from src.report_manager import month_bounds
+from src.response_manager import ResponseManager
+from src.routes.report import PeriodReportRequest, get_report_user
+
+router = APIRouter()
+
+ExportFormat = Literal["csv", "ndjson", "arrow", "parquet"]
+
+################### MODELS ###################
+
+class PeriodExportRequest(PeriodReportRequest):
+    format: ExportFormat = Field("csv", description="csv, ndjson, arrow (IPC stream) or parquet")
+
+################### FUNCTIONS ###################
+
+def export_response(request: Request, user_id: int, start: date, end: date, export_format: str,
+                    filename: str) -> StreamingResponse:
+    """Stream a user's expenses dated in [start, end) in the requested format."""
+    if export_format in COLUMNAR_FORMATS and (find_spec("pandas") is None or find_spec("pyarrow") is None):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"The {export_format} export requires pandas and pyarrow to be installed",
+        )
+    serializer, media_type = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        serializer(iter_expense_chunks(user_id, start, end, wrote_recently(request))),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+################### ROUTES ###################
+
+@router.get("/monthly/{user_id}/", responses=ResponseManager.responses, name="Export Monthly Expenses")
+async def export_monthly_report(
+    request: Request,
+    user_id: int,
+    month: Annotated[int, Query(ge=1, le=12)],
+    year: Annotated[int, Query(ge=1, le=9999)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    format: Annotated[ExportFormat, Query(description="csv, ndjson, arrow (IPC stream) or parquet")] = "csv",
+):
+    """Every expense of the month, streamed from the database in chunks."""
+    await get_report_user(db, user_id, current_user)
+    start, end = month_bounds(year, month)
+    return export_response(request, user_id, start, end, format, f"expenses_{user_id}_{year}-{month:02d}")
+
+@router.get("/period/{user_id}/", responses=ResponseManager.responses, name="Export Period Expenses")
+async def export_period_report(
+    request: Request,
+    user_id: int,
+    report_request: Annotated[PeriodExportRequest, Query()],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+):
+    """Every expense of an inclusive date range, streamed from the database in chunks."""
+    await get_report_user(db, user_id, current_user)
+    start, end = report_request.start_date, report_request.end_date + timedelta(days=1)
+    filename = f"expenses_{user_id}_{report_request.start_date}_{report_request.end_date}"
+    return export_response(request, user_id, start, end, report_request.format, filename)
@@ -1,9 +1,15 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from src.metrics_manager import render_metrics
 from src.response_manager import ResponseManager
 
 router = APIRouter()
 
-@router.get('/health', name="Health check of the API", responses=ResponseManager.responses)
+class HealthState(BaseModel):
+    state: str
+
+@router.get('/health', name="Health check of the API", responses=ResponseManager.responses, response_model=HealthState)
 async def get_health():
     """_summary_
     \n
@@ -17,4 +23,15 @@ async def get_health():
             "state": "API is currently running. Please proceed"
         }
     """
-    return {'state': 'API is currently running. Please proceed'}
\ No newline at end of file
+    return {'state': 'API is currently running. Please proceed'}
+
+@router.get('/metrics', name="Prometheus metrics of the API", response_class=PlainTextResponse)
+async def get_metrics():
+    """_summary_
+    \n
+    Request the request, database, password hashing and token metrics of this worker process
+    \n
+    Returns:
+        TEXT : Metrics in the Prometheus text exposition format (version 0.0.4)
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,77 +1,223 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database.models import Expense
-from src.database.models import User
+from datetime import date, datetime, timedelta
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, RootModel, model_validator
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.authentication_manager import CurrentUser, get_current_user, is_admin
+from src.cache_manager import response_cache
+from src.database.database import get_db, get_read_db
+from src.database.models import ReportJob, User
+from src.job_manager import job_manager, load_result
+from src.report_manager import (
+    month_bounds,
+    monthly_totals_by_category,
+    summarize,
+    totals_by_category,
+    totals_by_day,
+    totals_by_month,
+    totals_by_user,
+)
 from src.response_manager import ResponseManager
-from pydantic import BaseModel
-from datetime import date
-from src.database.database import get_db
-# from src.authentication_manager import get_current_user
 
 router = APIRouter()
 
-# class PeriodReportRequest(BaseModel):
-#     start_date: date
-#     end_date: date
-
-# @router.get("/monthly/{user_id}/", responses=ResponseManager.responses, name="Monthly Report")
-# async def get_monthly_report(user_id: int, month: int, year: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     if current_user.id != user_id:
-#         raise HTTPException(status_code=403, detail="Not authorized to view this report.")
-#     user = db.query(User).filter(User.id == user_id).first()
-#     if not user:
-#         raise HTTPException(status_code=404, detail="User not found")
-#     expenses = db.query(Expense).filter(
-#         Expense.user_id == user_id,
-#         Expense.date.between(f"{year}-{month:02d}-01", f"{year}-{month:02d}-31")
-#     ).all()
-#     report = {
-#         "user_id": user.id,
-#         "username": user.username,
-#         "month": month,
-#         "year": year,
-#         "expenses": [
-#             {"description": e.description, "amount": e.amount, "category": e.category, "date": e.date}
-#             for e in expenses
-#         ]
-#     }
-#     return report
-
-# @router.get("/period/{user_id}/", responses=ResponseManager.responses, name="Period Report")
-# async def get_period_report(user_id: int, report_request: PeriodReportRequest, db: Session = Depends(get_db),current_user: User = Depends(get_current_user)):
-#     user = db.query(User).filter(User.id == user_id).first()
-#     if not user:
-#         raise HTTPException(status_code=404, detail="User not found")
-#     expenses = db.query(Expense).filter(
-#         Expense.user_id == user_id,
-#         Expense.date.between(report_request.start_date, report_request.end_date)
-#     ).all()
-#     report = {
-#         "user_id": user.id,
-#         "username": user.username,
-#         "start_date": report_request.start_date,
-#         "end_date": report_request.end_date,
-#         "expenses": [
-#             {"description": e.description, "amount": e.amount, "category": e.category, "date": e.date}
-#             for e in expenses
-#         ]
-#     }
-#     return report
-
-# @router.get("/all/", responses=ResponseManager.responses, name="All Users Reports")
-# async def get_all_users_reports(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-#     """Generate reports for all users (admin only)."""
-#     if current_user.username != "admin":
-#         raise HTTPException(status_code=403, detail="Not authorized to access this resource.")
-
-#     users = db.query(User).all()
-#     reports = []
-#     for user in users:
-#         total_expenses = sum(expense.amount for expense in user.expenses)
-#         reports.append({
-#             "user_id": user.id,
-#             "username": user.username,
-#             "total_expenses": total_expenses,
-#             "remaining_budget": user.budget
-#         })
-#     return reports
\ No newline at end of file
+################### MODELS ###################
+
+class PeriodReportRequest(BaseModel):
+    start_date: date
+    end_date: date
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        if self.end_date < self.start_date:
+            raise ValueError("end_date must not be before start_date")
+        return self
+
+class CategoryTotal(BaseModel):
+    category: str
+    total: float
+    count: int
+    share: float
+
+class DayTotal(BaseModel):
+    date: date
+    total: float
+    cumulative_total: float
+
+class MonthTotal(BaseModel):
+    year: int
+    month: int
+    total: float
+    cumulative_total: float
+
+class MonthlyReport(BaseModel):
+    user_id: int
+    username: str
+    month: int
+    year: int
+    total: float
+    expense_count: int
+    by_category: list[CategoryTotal]
+    by_day: list[DayTotal]
+
+class PeriodReport(BaseModel):
+    user_id: int
+    username: str
+    start_date: date
+    end_date: date
+    total: float
+    expense_count: int
+    by_category: list[CategoryTotal]
+    by_month: list[MonthTotal]
+
+class UserReport(BaseModel):
+    user_id: int
+    username: str
+    total_expenses: float
+    expense_count: int
+    remaining_budget: float | None
+    rank: int
+
+class UserReports(RootModel[list[UserReport]]):
+    pass
+
+class ReportJobRequest(BaseModel):
+    kind: Literal["all_users"] = "all_users"
+
+class ReportJobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: int
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+    result: list[UserReport] | None = None
+    error: str | None = None
+
+################### FUNCTIONS ###################
+
+def check_report_access(user_id: int, current_user: CurrentUser) -> None:
+    """Reports can be seen by the user they are about and by admins."""
+    if current_user.id != user_id and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this report.")
+
+async def get_report_user(db: AsyncSession, user_id: int, current_user: CurrentUser) -> User:
+    """Load the user a report is about, checking the caller may see it (self or admin)."""
+    check_report_access(user_id, current_user)
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def job_status(job: ReportJob) -> ReportJobStatus:
+    return ReportJobStatus(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=load_result(job),
+        error=job.error,
+    )
+
+################### ROUTES ###################
+
+@router.get("/monthly/{user_id}/", responses=ResponseManager.responses, name="Monthly Report", response_model=MonthlyReport)
+async def get_monthly_report(
+    user_id: int,
+    month: Annotated[int, Query(ge=1, le=12)],
+    year: Annotated[int, Query(ge=1, le=9999)],
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)]
+):
+    """Totals of the month by category (from the monthly rollup) and by day (with running total)."""
+    check_report_access(user_id, current_user)
+
+    async def compute():
+        user = await get_report_user(db, user_id, current_user)
+        start, end = month_bounds(year, month)
+        return MonthlyReport(
+            user_id=user.id,
+            username=user.username,
+            month=month,
+            year=year,
+            **summarize(await monthly_totals_by_category(db, user_id, year, month)),
+            by_day=await totals_by_day(db, user_id, start, end),
+        )
+
+    return await response_cache.respond(request, db, f"user:{user_id}", compute)
+
+@router.get("/period/{user_id}/", responses=ResponseManager.responses, name="Period Report", response_model=PeriodReport)
+async def get_period_report(
+    user_id: int,
+    report_request: Annotated[PeriodReportRequest, Query()],
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)]
+):
+    """Totals of an inclusive date range by category and by month (with running total), aggregated in SQL."""
+    check_report_access(user_id, current_user)
+
+    async def compute():
+        user = await get_report_user(db, user_id, current_user)
+        start, end = report_request.start_date, report_request.end_date + timedelta(days=1)
+        return PeriodReport(
+            user_id=user.id,
+            username=user.username,
+            start_date=report_request.start_date,
+            end_date=report_request.end_date,
+            **summarize(await totals_by_category(db, user_id, start, end)),
+            by_month=await totals_by_month(db, user_id, start, end),
+        )
+
+    return await response_cache.respond(request, db, f"user:{user_id}", compute)
+
+@router.get("/all/", responses=ResponseManager.responses, name="All Users Reports", response_model=UserReports)
+async def get_all_users_reports(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[CurrentUser, Depends(is_admin)]
+):
+    """Generate reports for all users (admin only), in a single grouped query."""
+    async def compute():
+        return UserReports(await totals_by_user(db))
+
+    return await response_cache.respond(request, db, "all", compute)
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED, responses=ResponseManager.responses,
+             name="Submit Report Job", response_model=ReportJobStatus)
+async def submit_report_job(
+    job_request: ReportJobRequest,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(is_admin)]
+):
+    """
+    Queue a report computed in the background (admin only), to be polled at the returned Location.
+
+    While the data is unchanged, identical requests share the same job, and a recently finished
+    job is returned straight away with its result. Jobs are keyed on the cross-user data version
+    read on the primary, so a write committed by any worker, even one not yet on the replicas,
+    starts a new job.
+    """
+    data_version = await response_cache.version(db, "all")
+    job = await job_manager.submit(job_request.kind, data_version["token"], current_user.id)
+    response.headers["Location"] = f"/reports/jobs/{job.id}"
+    if job.status == "done":
+        response.status_code = status.HTTP_200_OK
+    return job_status(job)
+
+@router.get("/jobs/{job_id}", responses=ResponseManager.responses, name="Report Job Status",
+            response_model=ReportJobStatus)
+async def get_report_job(job_id: str, current_user: Annotated[CurrentUser, Depends(is_admin)]):
+    """Status and progress of a report job, with its result once done."""
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job_status(job)
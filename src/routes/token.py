@@ -1,76 +1,95 @@
-from datetime import datetime, timedelta, timezone
+import time
+import uuid
+from datetime import timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestFormStrict
-from jose import jwt
-from sqlalchemy.orm import Session
+from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from pydantic import BaseModel
 
-from src.config import ALGORITHM, JWT_EXPIRATION_MINUTES, SECRET_KEY
+from src.config import JWT_REFRESH_EXPIRATION_DAYS
 from src.database.database import get_db
-from src.database.models import User
-from src.password_manager import verify_password
+from src.database.models import RefreshToken, User
+from src.password_manager import password_hasher
+from src.rate_limiter import check_login_rate
+from src.response_manager import MessageResponse, ResponseManager
+from src.revocation_manager import revocation_list, revoke_sessions
+from src.token_manager import create_access_token, create_refresh_token, verify_token
 
 router = APIRouter()
 
 ################### FUNCTIONS ###################
 
-# Function to create an access token
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    """
-    Generates a JSON Web Token (JWT) for authentication.
-
-    Args:
-        data (dict): A dictionary containing the payload data for the token. 
-                     Must include a "sub" key representing the subject (e.g., user ID).
-        expires_delta (timedelta | None): Optional. A timedelta object representing the 
-                                           desired expiration time for the token. If not 
-                                           provided, the token will expire based on the 
-                                           JWT_EXPIRATION_MINUTES constant.
-
-    Returns:
-        str: The encoded JWT as a string.
-
-    Raises:
-        KeyError: If the "sub" key is not present in the input data.
-
-    Notes:
-        - The token includes an expiration time ("exp") and a subject ("sub").
-        - The expiration time is calculated based on the current UTC time and 
-          the JWT_EXPIRATION_MINUTES constant, or based on the provided expires_delta.
-        - The token is signed using the SECRET_KEY and the specified ALGORITHM.
-    """
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRATION_MINUTES)
-    to_encode.update({"exp": expire, "sub": data["sub"]})  # Ensure "sub" is included
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # The stored hash uses outdated parameters, upgrade it while we know the plain password
+        user.hashed_password = new_hash
+        try:
+            await db.commit()
+        except StaleDataError:
+            # The user changed meanwhile: keep that change, the hash is upgraded on a later login
+            await db.rollback()
+            user = await db.get(User, user.id)
     return user
 
+def credentials_error(detail: str = "Invalid refresh token") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_refresh_token(token: str) -> dict:
+    """Verify a refresh token (signature, expiry, type) and that its session is not revoked in memory."""
+    try:
+        claims = verify_token(token)
+    except JWTError as e:
+        raise credentials_error() from e
+    if claims.get("type") != "refresh" or not claims.get("jti") or claims["jti"] in revocation_list:
+        raise credentials_error()
+    return claims
+
+async def start_session(db: AsyncSession, user: User) -> str:
+    """Record a new login session and return its id, the "jti" of its refresh token."""
+    session = RefreshToken(
+        jti=uuid.uuid4().hex,
+        user_id=user.id,
+        expires_at=int(time.time() + timedelta(days=JWT_REFRESH_EXPIRATION_DAYS).total_seconds()),
+    )
+    db.add(session)
+    await db.commit()
+    return session.jti
+
 ################### MODELS ###################
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 ################### ROUTES ###################
 
 @router.post("/", name="Login", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestFormStrict, Depends()],
-                                 db: Annotated[Session, Depends(get_db)]
+async def login_for_access_token(request: Request,
+                                 form_data: Annotated[OAuth2PasswordRequestFormStrict, Depends()],
+                                 db: Annotated[AsyncSession, Depends(get_db)]
                                  ) -> Token:
-    user = authenticate_user(db, form_data.username, form_data.password)
+    await check_login_rate(request, form_data.username)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,5 +102,42 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestFormS
             detail="User account is disabled",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.username})
-    return Token(access_token=access_token, token_type="bearer")
\ No newline at end of file
+    session_id = await start_session(db, user)
+    access_token = create_access_token(data={"sub": user.username, "sid": session_id})
+    refresh_token = create_refresh_token(user.username, session_id)
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+@router.post("/refresh", responses=ResponseManager.responses, name="Refresh Access Token", response_model=Token,
+             response_model_exclude_none=True)
+async def refresh_access_token(refresh_request: RefreshRequest,
+                               db: Annotated[AsyncSession, Depends(get_db)]
+                               ) -> Token:
+    """New access token for a login session, without verifying the password again."""
+    claims = decode_refresh_token(refresh_request.refresh_token)
+    session = await db.get(RefreshToken, claims["jti"])
+    if session is None or session.revoked_at is not None:
+        # Revoked by another worker since its last sync
+        raise credentials_error()
+    result = await db.execute(select(User).where(User.username == claims["sub"]))
+    user = result.scalars().first()
+    if not user or user.id != session.user_id:
+        raise credentials_error()
+    if user.disabled:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is disabled",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(data={"sub": user.username, "sid": session.jti})
+    return Token(access_token=access_token, token_type="bearer")
+
+@router.post("/revoke", responses=ResponseManager.responses, name="Revoke Session", response_model=MessageResponse)
+async def revoke_session(refresh_request: RefreshRequest,
+                         db: Annotated[AsyncSession, Depends(get_db)]
+                         ):
+    """Log out: the refresh token and every access token of its session are rejected from now on."""
+    claims = decode_refresh_token(refresh_request.refresh_token)
+    revoked = await revoke_sessions(db, RefreshToken.jti == claims["jti"])
+    await db.commit()
+    revocation_list.add_all(revoked)
+    return {"message": "Session revoked."}
\ No newline at end of file
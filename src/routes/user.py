@@ -1,97 +1,62 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-
-from src.config import ALGORITHM, SECRET_KEY
-from src.database.database import get_db
-from src.database.models import User as UserModel
-from src.password_manager import get_password_hash
-from src.response_manager import ResponseManager
-
-from jose import jwt, JWTError
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.authentication_manager import CurrentUser, get_current_user, invalidate_user
+from src.cache_manager import response_cache
+from src.database.database import get_db, get_read_db
+from src.database.models import MonthlySpend, RefreshToken, User as UserModel
+from src.password_manager import password_hasher
+from src.response_manager import MessageResponse, ResponseManager
+from src.revocation_manager import revocation_list, revoke_sessions
+from src.version_manager import check_if_match, commit_versioned, version_etag
 
 router = APIRouter()
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
 ################### PYDANTIC MODELS ###################
 
 class UserSchema(BaseModel):
-    username: str = Field(..., description="The unique username of the user", example="john_doe")
-    password: str = Field(..., description="The password for the user account", example="secure_password123")
-    budget: float = Field(..., description="The budget allocated to the user", example=1000.0)
-    role: str = Field(None, description="The updated role of the user (optional)", example="user")
-    disabled: bool = Field(False, description="Indicates if the user account is disabled", example=False)
-
-    class Config:
-        orm_mode = True
-        from_attributes = True
-
-################### FUNCTIONS ###################
-
-def decode_jwt_token(token: str) -> dict:
-    """Decode and return the payload of a JWT token."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        ) from e
-
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)],
-                           db: Annotated[Session, Depends(get_db)]
-                           ) -> UserModel:
-    try:
-        payload = decode_jwt_token(token)
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        user = db.query(UserModel).filter(UserModel.username == username).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        if user.disabled:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="User account is disabled",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return user  # Return the SQLAlchemy model instance directly
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error",
-        ) from e
-
-def is_admin(current_user: Annotated[UserModel, Depends(get_current_user)]):
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to perform this action."
-        )
-    return current_user
-
+    username: str = Field(..., description="The unique username of the user", examples=["john_doe"])
+    password: str = Field(..., description="The password for the user account", examples=["secure_password123"])
+    budget: float = Field(..., description="The budget allocated to the user", examples=[1000.0])
+    role: str = Field(None, description="The updated role of the user (optional)", examples=["user"])
+    disabled: bool = Field(False, description="Indicates if the user account is disabled", examples=[False])
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UserOut(BaseModel):
+    username: str
+    budget: float | None
+    role: str | None
+    disabled: bool | None
+    version: int
+
+class UserProfile(BaseModel):
+    id: int
+    username: str
+    budget: float | None
+    role: str | None
+    disabled: bool | None
+    version: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UserUpdated(BaseModel):
+    user_id: int
+    username: str
+    budget: float | None
+    role: str | None
+    disabled: bool | None
+    version: int
 
 ################### ROUTES ###################
 
-@router.post("/create", name="Create User")
-async def create_user(user: UserSchema, db: Annotated[Session, Depends(get_db)]):
-    hashed_password = get_password_hash(user.password)
+@router.post("/create", name="Create User", response_model=UserOut)
+async def create_user(user: UserSchema, db: Annotated[AsyncSession, Depends(get_db)]):
+    hashed_password = await password_hasher.hash(user.password)
     db_user = UserModel(
         username=user.username,
         hashed_password=hashed_password,
@@ -100,37 +65,48 @@ async def create_user(user: UserSchema, db: Annotated[Session, Depends(get_db)])
         disabled=user.disabled
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return {"username": db_user.username, "budget": db_user.budget, "role": db_user.role, "disabled": db_user.disabled}
-
-@router.get("/me", name="Read Current User")
-async def read_users_me(current_user: Annotated[UserModel, Depends(get_current_user)]):
-    # Return a sanitized user response (do not expose hashed_password)
-    return {
-        "id": current_user.id,
-        "username": current_user.username,
-        "budget": current_user.budget,
-        "role": current_user.role,
-        "disabled": current_user.disabled
-    }
+    await db.flush()
+    await response_cache.invalidate_user(db, db_user.id)
+    await db.commit()
+    await db.refresh(db_user)
+    return {"username": db_user.username, "budget": db_user.budget, "role": db_user.role, "disabled": db_user.disabled,
+            "version": db_user.version}
+
+@router.get("/me", name="Read Current User", response_model=UserProfile)
+async def read_users_me(request: Request, db: Annotated[AsyncSession, Depends(get_read_db)],
+                        current_user: Annotated[CurrentUser, Depends(get_current_user)]):
+    # Read the row rather than the cached principal, which can lag behind the writes of other workers
+    user = await db.get(UserModel, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Return a sanitized user response (do not expose hashed_password); its version is the ETag
+    # the user and budget updates expect in If-Match
+    return response_cache.respond_row(request, version_etag(user.version), UserProfile.model_validate(user))
 
-@router.put("/update/{user_id}/", responses=ResponseManager.responses, name="Update User")
+@router.put("/update/{user_id}/", responses=ResponseManager.responses, name="Update User", response_model=UserUpdated)
 async def update_user(
     user_id: int,
     user_update: UserSchema,
-    db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[UserModel, Depends(get_current_user)]
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    if_match: Annotated[str | None, Header(description="Version of the user the update is based on")] = None,
 ):
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    """
+    Replace a user's fields. With If-Match, only if the user is still at that version (412 otherwise);
+    an update racing with another write of the user fails with 409 instead of overwriting it.
+    """
+    user = await db.get(UserModel, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    check_if_match(if_match, user.version)
 
+    previous_username = user.username
     user.username = user_update.username
     user.budget = user_update.budget
     user.disabled = user_update.disabled
     if user_update.password:
-        user.hashed_password = get_password_hash(user_update.password)
+        user.hashed_password = await password_hasher.hash(user_update.password)
     if user_update.role is not None:
         if current_user.role != "admin":
             raise HTTPException(
@@ -138,23 +114,38 @@ async def update_user(
                 detail="You do not have permission to update roles."
             )
         user.role = user_update.role
-    db.commit()
-    db.refresh(user)
+    # A disabled account is logged out of all its sessions
+    revoked = await revoke_sessions(db, RefreshToken.user_id == user.id) if user.disabled else []
+    await response_cache.invalidate_user(db, user.id)
+    await commit_versioned(db)
+    await db.refresh(user)
+    revocation_list.add_all(revoked)
+    invalidate_user(previous_username, user.username)
+    response.headers["ETag"] = version_etag(user.version)
     return {
         "user_id": user.id,
         "username": user.username,
         "budget": user.budget,
         "role": user.role,
-        "disabled": user.disabled
+        "disabled": user.disabled,
+        "version": user.version
     }
 
-@router.delete("/delete/{user_id}/", responses=ResponseManager.responses, name="Delete User")
-async def delete_user(user_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[UserModel, Depends(get_current_user)]):
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+@router.delete("/delete/{user_id}/", responses=ResponseManager.responses, name="Delete User",
+                response_model=MessageResponse)
+async def delete_user(user_id: int, db: Annotated[AsyncSession, Depends(get_db)], current_user: Annotated[CurrentUser, Depends(get_current_user)],
+                      if_match: Annotated[str | None, Header(description="Version of the user to delete")] = None):
+    user = await db.get(UserModel, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    check_if_match(if_match, user.version)
+    await db.execute(delete(MonthlySpend).where(MonthlySpend.user_id == user_id))
+    revoked = await revoke_sessions(db, RefreshToken.user_id == user_id)
+    await db.delete(user)
+    await response_cache.invalidate_user(db, user_id)
+    await commit_versioned(db)
+    revocation_list.add_all(revoked)
+    invalidate_user(user.username)
     return {"message": f"User with id {user_id} has been deleted."}
 
 # @router.get("/test/", responses=ResponseManager.responses, name="test User")
@@ -0,0 +1,150 @@
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from src.cache_manager import TTLCache
+from src.config import (
+    ALGORITHM,
+    JWT_EXPIRATION_MINUTES,
+    JWT_KEY_ID,
+    JWT_PRIVATE_KEY_FILE,
+    JWT_REFRESH_EXPIRATION_DAYS,
+    JWT_ROTATED_KEYS,
+    JWT_TOKEN_CACHE_SIZE,
+    SECRET_KEY,
+)
+from src.metrics_manager import JWT_DURATION, JWT_VERIFY_CACHE
+
+
+class TokenKeys:
+    """
+    Signing key and verification key set, parsed once at startup.
+
+    HMAC algorithms (HS*) sign and verify with a shared secret. Asymmetric algorithms (RS*, ES*)
+    sign with a PEM private key and verify with the matching public key. Tokens carry the "kid"
+    of the key that signed them, so previous keys can stay in the verification set while they rotate out.
+    """
+
+    def __init__(self, algorithm: str, key_id: str, signing_key: str, rotated_keys: dict[str, str] | None = None):
+        self.algorithm = algorithm
+        self.key_id = key_id
+        self.signing_key: Key = jwk.construct(signing_key, algorithm)
+        self.verification_keys: dict[str, Key] = {
+            kid: jwk.construct(value, algorithm) for kid, value in (rotated_keys or {}).items()
+        }
+        self.verification_keys[key_id] = self.signing_key if self.is_symmetric else self.signing_key.public_key()
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm.startswith("HS")
+
+    def verification_key(self, kid: str | None) -> Key:
+        """Return the key that verifies tokens signed under `kid` (tokens without one use the current key)."""
+        try:
+            return self.verification_keys[kid or self.key_id]
+        except KeyError:
+            raise JWTError(f"Unknown signing key id: {kid}") from None
+
+
+def _read_key(value: str) -> str:
+    with open(value) as key_file:
+        return key_file.read()
+
+def load_token_keys() -> TokenKeys:
+    """Build the key set from the configuration."""
+    if ALGORITHM.startswith("HS"):
+        signing_key = SECRET_KEY
+    elif JWT_PRIVATE_KEY_FILE:
+        signing_key = _read_key(JWT_PRIVATE_KEY_FILE)
+    else:
+        raise ValueError(f"JWT_PRIVATE_KEY_FILE must be set to sign tokens with {ALGORITHM}")
+
+    rotated_keys = {}
+    for entry in filter(None, (item.strip() for item in JWT_ROTATED_KEYS.split(","))):
+        kid, _, value = entry.partition("=")
+        rotated_keys[kid] = value if ALGORITHM.startswith("HS") else _read_key(value)
+    return TokenKeys(ALGORITHM, JWT_KEY_ID, signing_key, rotated_keys)
+
+
+# Keys are constructed once, not on every encode/decode
+token_keys = load_token_keys()
+
+# Claims of already verified tokens, keyed by the token digest and evicted at "exp"
+verified_tokens = TTLCache(max_size=JWT_TOKEN_CACHE_SIZE, ttl=JWT_EXPIRATION_MINUTES * 60)
+
+# Function to create an access token
+def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    """
+    Generates a JSON Web Token (JWT) for authentication.
+
+    Args:
+        data (dict): A dictionary containing the payload data for the token.
+                     Must include a "sub" key representing the subject (e.g., user ID).
+        expires_delta (timedelta | None): Optional. A timedelta object representing the
+                                           desired expiration time for the token. If not
+                                           provided, the token will expire based on the
+                                           JWT_EXPIRATION_MINUTES constant.
+
+    Returns:
+        str: The encoded JWT as a string.
+
+    Raises:
+        KeyError: If the "sub" key is not present in the input data.
+
+    Notes:
+        - The token includes an expiration time ("exp") and a subject ("sub").
+        - The expiration time is calculated based on the current UTC time and
+          the JWT_EXPIRATION_MINUTES constant, or based on the provided expires_delta.
+        - The token is signed with the preloaded signing key and its "kid" is set in the header.
+    """
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.now(timezone.utc) + expires_delta
+    else:
+        expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRATION_MINUTES)
+    to_encode.update({"exp": expire, "sub": data["sub"]})  # Ensure "sub" is included
+    start = time.perf_counter()
+    encoded_jwt = jwt.encode(
+        to_encode, token_keys.signing_key, algorithm=token_keys.algorithm, headers={"kid": token_keys.key_id}
+    )
+    JWT_DURATION.observe(time.perf_counter() - start, operation="encode")
+    return encoded_jwt
+
+def create_refresh_token(username: str, jti: str) -> str:
+    """
+    Generates the refresh token of a login session, only accepted by /token/refresh.
+
+    Its "jti" identifies the session: the access tokens refreshed from it carry it as "sid",
+    so revoking the session rejects all of them.
+    """
+    return create_access_token({"sub": username, "jti": jti, "type": "refresh"},
+                               expires_delta=timedelta(days=JWT_REFRESH_EXPIRATION_DAYS))
+
+def verify_token(token: str) -> dict:
+    """
+    Verify a JWT and return its claims.
+
+    Tokens that were already verified are answered from the cache until they expire,
+    so a client reusing the same token only costs a hash and a dict lookup.
+
+    Raises:
+        JWTError: If the token is malformed, expired or its signature doesn't match.
+    """
+    start = time.perf_counter()
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(digest)
+    if claims is not None:
+        JWT_VERIFY_CACHE.inc(result="hit")
+        JWT_DURATION.observe(time.perf_counter() - start, operation="verify")
+        return claims
+
+    JWT_VERIFY_CACHE.inc(result="miss")
+    key = token_keys.verification_key(jwt.get_unverified_header(token).get("kid"))
+    claims = jwt.decode(token, key, algorithms=[token_keys.algorithm])
+    expires_at = claims.get("exp")
+    verified_tokens.set(digest, claims, ttl=expires_at - time.time() if expires_at else None)
+    JWT_DURATION.observe(time.perf_counter() - start, operation="verify")
+    return claims
@@ -0,0 +1,46 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def version_etag(version: int) -> str:
+    """ETag of a row version, sent back by clients in If-Match."""
+    return f'"{version}"'
+
+def if_match_version(if_match: str | None) -> int | None:
+    """Version required by an If-Match header, None when absent or "*" (any version)."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match must be a row version") from None
+
+def check_if_match(if_match: str | None, version: int) -> None:
+    """Answer 412 if the client's If-Match does not name the current version of the row."""
+    expected = if_match_version(if_match)
+    if expected is not None and expected != version:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"The resource was modified (current version {version}), reload it and retry",
+            headers={"ETag": version_etag(version)},
+        )
+
+def conflict_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="The resource was modified concurrently, reload it and retry",
+    )
+
+async def commit_versioned(db: AsyncSession) -> None:
+    """
+    Commit ORM changes of versioned rows, answering 409 if another request changed them since they were loaded.
+
+    The UPDATE or DELETE of a versioned row matches its loaded version only, so concurrent writers
+    never overwrite each other and no row lock is held while the request runs.
+    """
+    try:
+        await db.commit()
+    except StaleDataError as e:
+        await db.rollback()
+        raise conflict_error() from e
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+# The settings are read at import: point the application at a scratch database first
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/expense_tracker.db"
+
+import httpx
+import pytest
+from sqlalchemy import update
+
+from main import app
+from src.database.database import AsyncSessionLocal
+from src.database.migrations import run_migrations
+from src.database.models import User
+
+run_migrations()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def login(client: httpx.AsyncClient, username: str, budget: float = 1000.0, role: str = "user") -> dict:
+    """Create a user with a fresh username and return its Authorization header."""
+    response = await client.post("/users/create", json={"username": username, "password": "pw", "budget": budget})
+    assert response.status_code == 200, response.text
+    if role != "user":
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(User).where(User.username == username).values(role=role))
+            await db.commit()
+    response = await client.post("/token/", data={"username": username, "password": "pw", "grant_type": "password"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
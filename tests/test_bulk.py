@@ -0,0 +1,15 @@
+import pytest
+
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_import_rejects_a_body_that_is_not_utf8(client):
+    headers = await login(client, "bulk_latin1")
+    body = "description,amount,category\nCafé,3.5,Food\n".encode("latin-1")
+
+    response = await client.post("/expenses/bulk", content=body, headers={**headers, "Content-Type": "text/csv"})
+
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"]["message"] == "The body is not valid UTF-8 (byte 31)"
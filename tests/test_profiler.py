@@ -0,0 +1,23 @@
+import pytest
+
+from src.database.profiler import QueryBudgetExceeded, query_budget
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_expense_listing_fits_its_query_budget(client):
+    headers = await login(client, "budget_lister")
+    for amount in (1, 2, 3):
+        await client.post("/expenses/", json={"description": "Item", "amount": amount, "category": "Food"},
+                          headers=headers)
+
+    with query_budget(3):
+        response = await client.get("/expenses/", headers=headers)
+    assert response.status_code == 200
+
+async def test_query_budget_fails_past_its_budget(client):
+    headers = await login(client, "budget_exceeder")
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(0):
+            await client.get("/expenses/", headers=headers)
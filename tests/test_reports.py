@@ -0,0 +1,25 @@
+import pytest
+
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_all_users_report_subtracts_the_month_spending(client):
+    admin = await login(client, "report_admin", role="admin")
+    headers = await login(client, "report_spender", budget=500.0)
+
+    def report_of(response):
+        return next(report for report in response.json() if report["username"] == "report_spender")
+
+    before = report_of(await client.get("/reports/all/", headers=admin))
+    assert before["remaining_budget"] == 500.0
+
+    response = await client.post("/expenses/", json={"description": "Lunch", "amount": 120.5, "category": "Food"},
+                                 headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["remaining_budget"] == 379.5
+
+    after = report_of(await client.get("/reports/all/", headers=admin))
+    assert after["remaining_budget"] == 379.5
+    assert after["total_expenses"] == 120.5
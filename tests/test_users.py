@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import update
+
+from src.cache_manager import response_cache
+from src.database.database import AsyncSessionLocal
+from src.database.models import User
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_profile_follows_a_write_made_by_another_worker(client):
+    headers = await login(client, "profile_reader", budget=100.0)
+    response = await client.get("/users/me", headers=headers)
+    assert response.json()["budget"] == 100.0
+    etag = response.headers["ETag"]
+    assert (await client.get("/users/me", headers={**headers, "If-None-Match": etag})).status_code == 304
+
+    # A write committed by another worker: the cached principal of this worker is not invalidated
+    async with AsyncSessionLocal() as db:
+        user_id = response.json()["id"]
+        await db.execute(update(User).where(User.id == user_id).values(budget=250.0, version=User.version + 1))
+        await response_cache.invalidate_user(db, user_id)
+        await db.commit()
+
+    response = await client.get("/users/me", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["budget"] == 250.0
+    assert response.headers["ETag"] == f'"{response.json()["version"]}"' != etag